@@ -0,0 +1,140 @@
+"""
+Нагрузка на синхронные и асинхронные страницы новостей под ASGI.
+
+Запускает uvicorn с проектом ya_news и для каждой пары страниц
+(главная, отдельная новость) сравнивает пропускную способность
+и задержки при одинаковом числе одновременных клиентов.
+По умолчанию кэш отключён, чтобы замерять работу представлений.
+
+Нужен установленный uvicorn и база с новостями:
+    cd ya_news && python manage.py migrate && python manage.py loaddata news
+Запуск из корня репозитория:
+    python benchmarks/asgi_load.py --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent / 'ya_news'
+HOST = '127.0.0.1'
+
+
+async def fetch(port, path, cookie=None):
+    """Один запрос HTTP/1.1, возвращает статус и тело ответа."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    headers = f'Cookie: {cookie}\r\n' if cookie else ''
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n{headers}'
+        'Connection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    status = int(data.split(b' ', 2)[1])
+    return status, data.partition(b'\r\n\r\n')[2]
+
+
+async def wait_for_server(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return await fetch(port, '/')
+        except (OSError, IndexError, ValueError):
+            await asyncio.sleep(0.2)
+    raise SystemExit('Сервер не запустился.')
+
+
+async def client(port, path, stop_at, latencies, errors):
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        try:
+            status, _ = await fetch(port, path)
+        except OSError:
+            status = None
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status)
+
+
+async def load(port, path, concurrency, duration):
+    latencies, errors = [], []
+    stop_at = time.monotonic() + duration
+    await asyncio.gather(*(
+        client(port, path, stop_at, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    return latencies, errors
+
+
+def report(label, path, latencies, errors, duration):
+    if len(latencies) < 2:
+        print(f'{label:>6} {path:<20} нет успешных ответов: {len(errors)}')
+        return
+    milliseconds = [latency * 1000 for latency in latencies]
+    percentiles = statistics.quantiles(milliseconds, n=100)
+    print(
+        f'{label:>6} {path:<20} {len(latencies) / duration:8.1f} запр/с  '
+        f'p50 {percentiles[49]:7.1f} мс  p99 {percentiles[98]:7.1f} мс  '
+        f'ошибок {len(errors)}'
+    )
+
+
+async def run(args, port):
+    _, body = await wait_for_server(port)
+    found = re.search(rb'/news/(\d+)/', body)
+    if found is None:
+        raise SystemExit('В базе нет новостей, см. описание в начале файла.')
+    news_pk = found.group(1).decode()
+    pairs = (
+        ('/', '/async/'),
+        (f'/news/{news_pk}/', f'/async/news/{news_pk}/'),
+    )
+    for sync_path, async_path in pairs:
+        for label, path in (('sync', sync_path), ('async', async_path)):
+            # Прогрев: соединения потоков, шаблоны, кэш запросов.
+            await load(port, path, args.concurrency, 1)
+            latencies, errors = await load(
+                port, path, args.concurrency, args.duration
+            )
+            report(label, path, latencies, errors, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--settings', default='yanews.settings_production')
+    parser.add_argument(
+        '--cache', default='dummy', help='значение YANEWS_CACHE'
+    )
+    args = parser.parse_args()
+    environment = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': args.settings,
+        'YANEWS_CACHE': args.cache,
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable, '-m', 'uvicorn', 'yanews.asgi:application',
+            '--host', HOST, '--port', str(args.port),
+            '--log-level', 'warning', '--no-access-log',
+        ],
+        cwd=PROJECT_DIR, env=environment,
+    )
+    try:
+        asyncio.run(run(args, args.port))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Сравнение проверки запрещённых слов: цикл с `in` против автомата.
+
+Запуск из корня репозитория:
+    python benchmarks/bad_words.py --words 5000 --text-words 200
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ya_news'))
+
+from news.moderation import WordMatcher  # noqa: E402
+
+ALPHABET = 'абвгдежзиклмнопрстуфхцчшщыэюя'
+
+
+def random_word(rng, min_length=4, max_length=10):
+    length = rng.randint(min_length, max_length)
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def loop_check(words, text):
+    """Исходная проверка из CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--words', type=int, default=5000)
+    parser.add_argument('--text-words', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Длинные слова почти не встречаются в тексте: худший случай для цикла.
+    words = [random_word(rng, 12, 16) for _ in range(args.words)]
+    text = ' '.join(random_word(rng) for _ in range(args.text_words))
+
+    build = timeit.timeit(lambda: WordMatcher(words), number=1)
+    matcher = WordMatcher(words)
+    loop = timeit.timeit(lambda: loop_check(words, text), number=args.repeat)
+    automaton = timeit.timeit(lambda: matcher.find(text), number=args.repeat)
+
+    print(f'Слов в списке: {args.words}, слов в тексте: {args.text_words}')
+    print(f'Построение автомата: {build * 1000:.1f} мс')
+    print(f'Цикл с in:  {loop / args.repeat * 1e6:.1f} мкс на текст')
+    print(f'Автомат:    {automaton / args.repeat * 1e6:.1f} мкс на текст')
+    print(f'Ускорение:  x{loop / automaton:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+"""
+Замеры всех именованных маршрутов news.urls и notes.urls.
+
+Для каждого проекта создаёт временную базу, заполняет её синтетическими
+данными и обходит маршруты тестовым клиентом Django, затем через
+runserver (WSGI) и uvicorn (ASGI, если установлен). Записывает
+пропускную способность, задержки p50/p95/p99, число SQL-запросов
+и пиковую память в JSON. С --compare сравнивает с сохранённым
+результатом и завершается с кодом 1 при ухудшении.
+
+Запуск из корня репозитория:
+    python benchmarks/routes.py --output baseline.json
+    python benchmarks/routes.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgi_load import HOST, fetch, wait_for_server
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+PROJECTS = {
+    'ya_news': {
+        'settings': 'yanews.settings_production',
+        'asgi': 'yanews.asgi:application',
+        'namespace': 'news',
+    },
+    'ya_note': {
+        'settings': 'yanote.settings_production',
+        'asgi': 'yanote.asgi:application',
+        'namespace': 'notes',
+    },
+}
+BENCH_SETTINGS = '''from {settings} import *  # noqa
+from {settings} import DATABASES
+
+DATABASES['default'] = {{**DATABASES['default'], 'NAME': {database!r}}}
+ALLOWED_HOSTS = ['*']
+'''
+WORDS = (
+    'новость город студенты проект приложение неделя погода театр '
+    'выставка команда матч решение история вечер утро работа'
+).split()
+
+
+@dataclass
+class Route:
+    args: tuple = ()
+    query: dict = field(default_factory=dict)
+    auth: bool = False
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+
+def create_users(count):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(username=f'user{index}') for index in range(count)
+    )
+    # bulk_create в SQLite не возвращает первичные ключи.
+    return list(User.objects.order_by('pk'))
+
+
+def seed_news(args, rng):
+    from news.models import Comment, News
+    from news.search import rebuild_index
+
+    users = create_users(args.users)
+    News.objects.bulk_create(
+        News(title=sentence(rng, 4), text=sentence(rng, 60))
+        for _ in range(args.news)
+    )
+    Comment.objects.bulk_create(
+        Comment(
+            news=news, author=users[index % len(users)],
+            text=sentence(rng, 15),
+        )
+        for news in News.objects.all()
+        for index in range(args.comments)
+    )
+    rebuild_index()
+    news = News.objects.order_by('-date', 'pk').first()
+    comment = Comment.objects.filter(news=news, author=users[0]).first()
+    # Без комментариев (--comments 0) править и удалять нечего:
+    # None помечает маршрут, который пропускается.
+    comment_route = comment and Route(args=(comment.pk,), auth=True)
+    return users[0], {
+        'news:home': Route(),
+        'news:search': Route(query={'q': 'новости'}),
+        'news:detail': Route(args=(news.pk,)),
+        'news:comments': Route(args=(news.pk,)),
+        'news:edit': comment_route,
+        'news:delete': comment_route,
+        'news:async_home': Route(),
+        'news:async_detail': Route(args=(news.pk,)),
+    }
+
+
+def seed_notes(args, rng):
+    from notes.models import Note
+    from notes.search import index_notes_after
+
+    users = create_users(args.users)
+    Note.objects.bulk_create(
+        Note(
+            title=sentence(rng, 4), text=sentence(rng, 60),
+            slug=f'note-{user.pk}-{index}', author=user,
+        )
+        for user in users
+        for index in range(args.notes)
+    )
+    index_notes_after(0)
+    note = Note.objects.filter(author=users[0]).first()
+    return users[0], {
+        'notes:home': Route(),
+        'notes:add': Route(auth=True),
+        'notes:list': Route(auth=True),
+        'notes:search': Route(query={'q': 'новость'}, auth=True),
+        'notes:export': Route(auth=True),
+        'notes:success': Route(auth=True),
+        'notes:detail': Route(args=(note.slug,), auth=True),
+        'notes:edit': Route(args=(note.slug,), auth=True),
+        'notes:delete': Route(args=(note.slug,), auth=True),
+    }
+
+
+SEEDERS = {'ya_news': seed_news, 'ya_note': seed_notes}
+
+
+def summarize(latencies, errors, duration=None):
+    milliseconds = sorted(latency * 1000 for latency in latencies)
+    if len(milliseconds) < 2:
+        return {'requests': len(milliseconds), 'errors': errors}
+    percentiles = statistics.quantiles(milliseconds, n=100)
+    total = duration or sum(latencies)
+    return {
+        'requests': len(milliseconds),
+        'errors': errors,
+        'rps': round(len(milliseconds) / total, 1),
+        'p50_ms': round(percentiles[49], 2),
+        'p95_ms': round(percentiles[94], 2),
+        'p99_ms': round(percentiles[98], 2),
+    }
+
+
+def bench_client(routes, user, args):
+    """Тестовый клиент: задержки, SQL-запросы и пиковая память."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    anonymous, authorized = Client(), Client()
+    authorized.force_login(user)
+    results = {}
+    for name, route in routes.items():
+        client = authorized if route.auth else anonymous
+        url = reverse(name, args=route.args)
+
+        def get():
+            response = client.get(url, route.query)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response.status_code
+
+        for _ in range(args.warmup):
+            get()
+        latencies, errors = [], 0
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                status = get()
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        # Следующие запросы очищают журнал соединения.
+        query_count = len(queries)
+        tracemalloc.start()
+        for _ in range(args.memory_requests):
+            get()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            **summarize(latencies, errors),
+            'queries': round(query_count / args.requests, 2),
+            'peak_kb': round(peak / 1024),
+        }
+    return results, authorized.cookies
+
+
+async def load(port, path, cookie, concurrency, duration):
+    latencies, errors = [], 0
+    stop_at = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                status, _ = await fetch(port, path, cookie)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, duration)
+
+
+async def bench_server(port, routes, cookie, args):
+    from django.urls import reverse
+    from django.utils.http import urlencode
+
+    await wait_for_server(port)
+    results = {}
+    for name, route in routes.items():
+        path = reverse(name, args=route.args)
+        if route.query:
+            path += '?' + urlencode(route.query)
+        session = cookie if route.auth else None
+        await load(port, path, session, args.concurrency, args.warmup_seconds)
+        results[name] = await load(
+            port, path, session, args.concurrency, args.duration
+        )
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def server_commands(project, port):
+    commands = {'wsgi': [
+        sys.executable, 'manage.py', 'runserver', f'{HOST}:{port}',
+        '--noreload', '--nostatic',
+    ]}
+    if importlib.util.find_spec('uvicorn'):
+        commands['asgi'] = [
+            sys.executable, '-m', 'uvicorn', PROJECTS[project]['asgi'],
+            '--host', HOST, '--port', str(port),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+    return commands
+
+
+def run_project(project, args, directory):
+    """Все замеры одного проекта во временной базе в directory."""
+    Path(directory, 'bench_settings.py').write_text(BENCH_SETTINGS.format(
+        settings=PROJECTS[project]['settings'],
+        database=str(Path(directory, 'db.sqlite3')),
+    ))
+    project_dir = ROOT_DIR / project
+    sys.path[:0] = [directory, str(project_dir)]
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+    environment = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join((directory, str(project_dir))),
+    }
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+    user, routes = SEEDERS[project](args, random.Random(args.seed))
+    namespace = PROJECTS[project]['namespace']
+    names = {
+        f'{namespace}:{pattern.name}'
+        for pattern in importlib.import_module(f'{namespace}.urls').urlpatterns
+        if pattern.name
+    }
+    if names - set(routes):
+        raise SystemExit(f'Нет сценария для маршрутов: {names - set(routes)}')
+    skipped = sorted(name for name, route in routes.items() if route is None)
+    if skipped:
+        print(f'{project}: пропущены маршруты {", ".join(skipped)}')
+    routes = {
+        name: route for name, route in routes.items() if route is not None
+    }
+
+    results = {}
+    results['client'], cookies = bench_client(routes, user, args)
+    cookie = f'{settings.SESSION_COOKIE_NAME}=' + (
+        cookies[settings.SESSION_COOKIE_NAME].value
+    )
+    for mode, command in server_commands(project, args.port).items():
+        server = subprocess.Popen(
+            command, cwd=project_dir, env=environment,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            results[mode] = asyncio.run(
+                bench_server(args.port, routes, cookie, args)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def compare_route(old, new, tolerance):
+    regressions = []
+    if new.get('queries', 0) > old.get('queries', 0):
+        regressions.append(f'запросов {old["queries"]} -> {new["queries"]}')
+    for key in ('p95_ms', 'peak_kb'):
+        if key in old and new.get(key, 0) > old[key] * (1 + tolerance):
+            regressions.append(f'{key} {old[key]} -> {new[key]}')
+    if 'rps' in old and new.get('rps', 0) < old['rps'] * (1 - tolerance):
+        regressions.append(f'rps {old["rps"]} -> {new.get("rps")}')
+    return regressions
+
+
+def compare(baseline, current, tolerance):
+    """Список ухудшений относительно baseline."""
+    regressions = []
+    for project, modes in current['results'].items():
+        for mode, routes in modes.items():
+            old_routes = baseline['results'].get(project, {}).get(mode, {})
+            for name, new in routes.items():
+                if name in old_routes:
+                    regressions.extend(
+                        f'{project} {mode} {name}: {regression}'
+                        for regression in compare_route(
+                            old_routes[name], new, tolerance
+                        )
+                    )
+    return regressions
+
+
+def print_results(report):
+    for project, modes in report['results'].items():
+        for mode, routes in modes.items():
+            for name, result in routes.items():
+                print(
+                    f'{project:<8} {mode:<6} {name:<20} '
+                    f'{result.get("rps", 0):8.1f} запр/с  '
+                    f'p50 {result.get("p50_ms", 0):7.2f}  '
+                    f'p95 {result.get("p95_ms", 0):7.2f}  '
+                    f'p99 {result.get("p99_ms", 0):7.2f} мс  '
+                    f'запросов {result.get("queries", "-")}  '
+                    f'память {result.get("peak_kb", "-")} КиБ  '
+                    f'ошибок {result["errors"]}'
+                )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--project', choices=sorted(PROJECTS),
+                        action='append')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--news', type=int, default=200)
+    parser.add_argument('--comments', type=int, default=20,
+                        help='комментариев на новость')
+    parser.add_argument('--notes', type=int, default=100,
+                        help='заметок на пользователя')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='запросов тестовым клиентом на маршрут')
+    parser.add_argument('--memory-requests', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=2,
+                        help='секунд нагрузки на маршрут для сервера')
+    parser.add_argument('--warmup-seconds', type=float, default=0.5)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='куда записать результат')
+    parser.add_argument('--compare', help='результат для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='допустимое ухудшение, доля')
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # Маршрутам с аргументами нужны пользователь, новость и заметка.
+    for name in ('users', 'news', 'notes'):
+        if getattr(args, name) < 1:
+            parser.error(f'--{name} должно быть не меньше 1')
+    if args.comments < 0:
+        parser.error('--comments не может быть отрицательным')
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.worker_output:
+        # Каждый проект - отдельный процесс со своими настройками Django.
+        args.port = args.port or free_port()
+        with tempfile.TemporaryDirectory(prefix='bench-') as directory:
+            results = run_project(args.project[-1], args, directory)
+        Path(args.worker_output).write_text(json.dumps(results))
+        return
+    report = {
+        'meta': {
+            key: getattr(args, key) for key in (
+                'users', 'news', 'comments', 'notes', 'requests',
+                'concurrency', 'duration', 'seed',
+            )
+        },
+        'results': {},
+    }
+    for project in args.project or sorted(PROJECTS):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            subprocess.run(
+                [sys.executable, __file__, *sys.argv[1:],
+                 '--project', project, '--worker-output', output.name],
+                check=True,
+            )
+            report['results'][project] = json.loads(
+                Path(output.name).read_text()
+            )
+    print_results(report)
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2)
+        )
+    if args.compare:
+        regressions = compare(
+            json.loads(Path(args.compare).read_text()), report, args.tolerance
+        )
+        for regression in regressions:
+            print('Ухудшение:', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
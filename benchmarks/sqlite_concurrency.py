@@ -0,0 +1,153 @@
+"""
+Конкурентная запись в SQLite: настройки по умолчанию против профиля production.
+
+Каждый процесс имитирует запросы к сайту: писатели добавляют комментарий
+и увеличивают счётчик у новости, читатели выбирают главную страницу.
+Профиль по умолчанию открывает соединение на каждый запрос, как Django
+с CONN_MAX_AGE = 0; профиль production держит соединение и выполняет
+PRAGMA из yanews.settings_production.
+
+Запуск из корня репозитория:
+    python benchmarks/sqlite_concurrency.py --writers 8 --readers 8
+"""
+import argparse
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ya_news'))
+
+from yanews.settings_production import (  # noqa: E402
+    DATABASES, SQLITE_PRAGMAS
+)
+
+PROFILES = {
+    'default': {'timeout': 5, 'persistent': False, 'pragmas': {}},
+    'production': {
+        'timeout': DATABASES['default']['OPTIONS']['timeout'],
+        'persistent': True,
+        'pragmas': SQLITE_PRAGMAS,
+    },
+}
+
+SCHEMA = (
+    'CREATE TABLE news (id INTEGER PRIMARY KEY, title TEXT, '
+    'date TEXT, comment_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX news_date ON news (date DESC)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, news_id INTEGER, '
+    'text TEXT, created TEXT)',
+    'CREATE INDEX comment_news ON comment (news_id, created)',
+)
+
+
+def create_database(path, news_count):
+    connection = sqlite3.connect(path)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.executemany(
+        'INSERT INTO news (title, date) VALUES (?, date("now", ?))',
+        ((f'Новость {index}', f'-{index} day') for index in range(news_count))
+    )
+    connection.commit()
+    connection.close()
+
+
+def connect(path, profile):
+    connection = sqlite3.connect(path, timeout=profile['timeout'])
+    for name, value in profile['pragmas'].items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def write(connection, news_id):
+    with connection:
+        connection.execute(
+            'INSERT INTO comment (news_id, text, created) '
+            'VALUES (?, ?, datetime("now"))',
+            (news_id, 'Текст комментария')
+        )
+        connection.execute(
+            'UPDATE news SET comment_count = comment_count + 1 WHERE id = ?',
+            (news_id,)
+        )
+
+
+def read(connection, news_id):
+    connection.execute(
+        'SELECT id, title, date, comment_count FROM news '
+        'ORDER BY date DESC LIMIT 10'
+    ).fetchall()
+
+
+def worker(path, profile_name, action, requests, news_count, results):
+    profile = PROFILES[profile_name]
+    handler = write if action == 'write' else read
+    connection = connect(path, profile) if profile['persistent'] else None
+    done = errors = 0
+    for index in range(requests):
+        current = connection or connect(path, profile)
+        try:
+            handler(current, index % news_count + 1)
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        finally:
+            if connection is None:
+                current.close()
+    results.put((action, done, errors))
+
+
+def run(profile_name, args):
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / 'db.sqlite3')
+        create_database(path, args.news)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(
+                path, profile_name, action, args.requests, args.news, results
+            ))
+            for action, count in (
+                ('write', args.writers), ('read', args.readers)
+            )
+            for _ in range(count)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = {'write': [0, 0], 'read': [0, 0]}
+        for _ in processes:
+            action, done, errors = results.get()
+            totals[action][0] += done
+            totals[action][1] += errors
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+    print(
+        f'{profile_name:>10}: {elapsed:7.2f} с, '
+        f'записей {totals["write"][0] / elapsed:8.0f}/с '
+        f'(ошибок {totals["write"][1]}), '
+        f'чтений {totals["read"][0] / elapsed:8.0f}/с '
+        f'(ошибок {totals["read"][1]})'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--news', type=int, default=1000)
+    parser.add_argument(
+        '--profile', choices=sorted(PROFILES), action='append',
+        help='по умолчанию сравниваются все профили'
+    )
+    args = parser.parse_args()
+    for profile_name in args.profile or sorted(PROFILES):
+        run(profile_name, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,48 @@ print_message () {
     echo -e "${left_filler_len// /$symbol}$message${right_filler_len// /$symbol}\033[0m"
 }
 
+run_suites_in_parallel () {
+    # Run both projects at once and shard each suite across xdist workers.
+    # Every worker gets its own file database that --reuse-db keeps between runs.
+    local logs=$(mktemp -d)
+    local pytest_args="-n auto --reuse-db --durations=20 --tb=line"
+    (
+        cd ya_news
+        export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
+        YANEWS_TEST_DB=.test_db.sqlite3 pytest $pytest_args
+    ) > "$logs/ya_news.log" 2>&1 &
+    local news_pid=$!
+    (
+        cd ya_note
+        export DJANGO_SETTINGS_MODULE="yanote.settings"
+        YANOTE_TEST_DB=.test_db.sqlite3 pytest $pytest_args
+    ) > "$logs/ya_note.log" 2>&1 &
+    local note_pid=$!
+    wait $news_pid
+    local news_status=$?
+    wait $note_pid
+    local note_status=$?
+    cat "$logs/ya_news.log" "$logs/ya_note.log" 1>&2
+    rm -r "$logs"
+    if [[ $news_status -ne 0 ]]; then
+        print_message " При запуске упали ваши тесты для проекта YaNews. Проверьте тесты этого проекта " "=" 1
+        echo \`\`\` 1>&2
+        exit $news_status
+    fi
+    if [[ $note_status -ne 0 ]]; then
+        print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
+        echo \`\`\` 1>&2
+        exit $note_status
+    fi
+    exit 0
+}
+
+# ./run_tests.sh --parallel runs the test suites with run_suites_in_parallel.
+PARALLEL=""
+if [[ "$1" == "--parallel" ]]; then
+    PARALLEL=1
+fi
+
 
 if python -m flake8 --config=setup.cfg 1>&2;
 then
@@ -21,6 +63,9 @@ then
     echo $LF 1>&2
     if python structure_test.py
     then
+        if [[ -n "$PARALLEL" ]]; then
+            run_suites_in_parallel
+        fi
         cd ya_news
         export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
         if pytest --tb=line 1>&2;
@@ -0,0 +1,6 @@
+"""
+Код, общий для проектов ya_news и ya_note.
+
+Настройки каждого проекта добавляют корень репозитория в sys.path,
+поэтому пакет импортируется как shared.
+"""
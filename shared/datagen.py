@@ -0,0 +1,170 @@
+"""
+Синтетические данные для команд generate_data обоих проектов.
+
+Тексты из кириллических слов с частотами по закону Ципфа, раскладка
+строк по родительским объектам с тем же длинным хвостом и основа
+команды: общие параметры, пользователи и вставка пачками.
+"""
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+SYLLABLES = (
+    'ба', 'ве', 'ги', 'до', 'жу', 'за', 'ки', 'ла', 'ми', 'но', 'пе', 'ро',
+    'са', 'ту', 'фе', 'хо', 'це', 'чи', 'ша', 'ны', 'ст', 'вы', 'ре', 'ко',
+)
+
+
+class TextGenerator:
+    """
+    Кириллический текст с частотами слов по закону Ципфа.
+
+    Самыми частыми идут common_words, остальной словарь собирается
+    из случайных слогов.
+    """
+
+    def __init__(self, rng, common_words, vocabulary_size=5000,
+                 exponent=1.1):
+        self.rng = rng
+        words = list(common_words)
+        while len(words) < vocabulary_size:
+            words.append(''.join(
+                rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))
+            ))
+        self.words = words
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(words) + 1)
+        ))
+
+    def sentence(self, length):
+        words = self.rng.choices(
+            self.words, cum_weights=self.cum_weights, k=max(length, 1)
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def text(self, length):
+        sentences = []
+        while length > 0:
+            size = min(length, self.rng.randint(5, 15))
+            sentences.append(self.sentence(size))
+            length -= size
+        return ' '.join(sentences)
+
+    def lognormal_length(self, median, sigma, limit):
+        """Длина с длинным хвостом: большинство короткие, редкие - длинные."""
+        value = self.rng.lognormvariate(0, sigma) * median
+        return max(1, min(int(value), limit))
+
+
+def zipf_counts(rng, items, total, exponent, chunk_size):
+    """
+    Раскладывает total по items элементам по закону Ципфа.
+
+    Место элемента в распределении выбирается случайно, поэтому
+    самые нагруженные элементы не идут подряд.
+    """
+    ranks = list(range(items))
+    rng.shuffle(ranks)
+    cum_weights = list(accumulate(
+        1 / rank ** exponent for rank in range(1, items + 1)
+    ))
+    counts = [0] * items
+    while total > 0:
+        size = min(total, chunk_size)
+        for rank in rng.choices(ranks, cum_weights=cum_weights, k=size):
+            counts[rank] += 1
+        total -= size
+    return counts
+
+
+class GenerateDataCommand(BaseCommand):
+    """
+    Основа команд generate_data.
+
+    Подкласс добавляет свои параметры к общим, в handle вызывает
+    prepare, а строки своих моделей сохраняет через save_in_chunks.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять одним INSERT.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Сколько строк фиксировать одной транзакцией.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def prepare(self, counts, common_words, *, batch_size, chunk_size, seed,
+                **options):
+        """Проверяет количества и размеры пачек, готовит генераторы."""
+        if min(counts) < 0:
+            raise CommandError('Количества не могут быть отрицательными.')
+        if min(batch_size, chunk_size) < 1:
+            raise CommandError('Размеры пачек должны быть больше нуля.')
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.text = TextGenerator(self.rng, common_words)
+
+    def create_users(self, count):
+        """Пользователи с префиксом по seed, возвращает их ключи."""
+        User = get_user_model()
+        prefix = f'gen{self.seed}-'
+        password = make_password(None)
+        self.save_in_chunks('Пользователи', User.objects, (
+            User(username=f'{prefix}{index}', password=password)
+            for index in range(count)
+        ), ignore_conflicts=True)
+        # bulk_create в SQLite не возвращает первичные ключи.
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+
+    def save_in_chunks(self, label, manager, objects, after_save=None,
+                       **kwargs):
+        """
+        Сохраняет объекты транзакциями по chunk_size строк.
+
+        after_save получает каждую сохранённую пачку внутри её транзакции.
+        """
+        started = time.monotonic()
+        saved = 0
+        chunk = []
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) >= self.chunk_size:
+                saved += self.save_chunk(manager, chunk, after_save, **kwargs)
+                chunk = []
+                self.report(label, saved, started)
+        saved += self.save_chunk(manager, chunk, after_save, **kwargs)
+        self.report(label, saved, started)
+
+    def save_chunk(self, manager, chunk, after_save=None, **kwargs):
+        # Отдельный bulk_create на пачку: менеджер может обновлять
+        # связанные строки запросом, число параметров которого растёт
+        # с размером пачки, как счётчики комментариев у новостей.
+        with transaction.atomic():
+            for start in range(0, len(chunk), self.batch_size):
+                manager.bulk_create(
+                    chunk[start:start + self.batch_size], **kwargs
+                )
+            if after_save is not None:
+                after_save(chunk)
+        return len(chunk)
+
+    def report(self, label, saved, started):
+        elapsed = time.monotonic() - started
+        rate = saved / elapsed if elapsed else 0
+        self.stdout.write(f'{label}: {saved}, {rate:.0f} строк/с')
@@ -0,0 +1,17 @@
+"""Настройка новых соединений с SQLite."""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Выполняет PRAGMA из настройки SQLITE_PRAGMAS.
+
+    PRAGMA действуют только на текущее соединение,
+    поэтому их нужно повторять при каждом подключении.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,331 @@
+"""
+Стоимость запросов по представлениям.
+
+MetricsMiddleware считает для каждого запроса число SQL-запросов,
+время в базе, время рендеринга шаблона и полное время, добавляет их
+в заголовок Server-Timing и копит суммы по имени маршрута.
+Суммы отдаются в текстовом формате Prometheus представлением
+metrics_view. При нескольких процессах суммы складываются через файлы
+в METRICS_DIR. Запросы к базе во время отдачи потоковых ответов,
+например выгрузки, не учитываются.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Значения в SQL уже вынесены в параметры, но длина списков IN
+# зависит от данных: такие запросы считаем одинаковыми.
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+current_stats = ContextVar('request_stats', default=None)
+
+
+def normalize_sql(sql):
+    return NUMBER.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+class RequestStats:
+    """Стоимость одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0
+        self.render_time = 0
+        self.queries = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def repeated_queries(self, threshold):
+        """Одинаковые запросы, повторённые не меньше threshold раз."""
+        return [
+            (sql, count) for sql, count in self.queries.most_common()
+            if count >= threshold
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries[normalize_sql(sql)] += 1
+
+
+def instrument(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения, открытые позже, например в пуле потоков асинхронных
+# представлений, получают обёртку здесь.
+connection_created.connect(instrument)
+
+
+class Registry:
+    """
+    Суммы по именам маршрутов.
+
+    Каждый процесс копит свои суммы. Если задан METRICS_DIR, процесс
+    не чаще раза в METRICS_DUMP_INTERVAL секунд записывает их в свой
+    файл в этом каталоге, а metrics_view складывает файлы всех
+    процессов: при нескольких воркерах любой из них отдаёт общие суммы.
+    Файлы завершившихся процессов остаются, поэтому суммы не убывают.
+    """
+    COUNTERS = (
+        'requests', 'queries', 'db_seconds', 'render_seconds',
+        'duration_seconds', 'n_plus_one',
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.requests = Counter()
+        self.queries = Counter()
+        self.db_seconds = defaultdict(float)
+        self.render_seconds = defaultdict(float)
+        self.duration_seconds = defaultdict(float)
+        self.duration_buckets = defaultdict(
+            lambda: [0] * len(DURATION_BUCKETS)
+        )
+        self.n_plus_one = Counter()
+        self.pid = os.getpid()
+        self.path = None
+        self.dumped = 0
+
+    def add(self, view, stats, duration, repeated):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Дочерний процесс после fork считает с нуля в свой файл.
+                self.clear()
+            self.requests[view] += 1
+            self.queries[view] += stats.query_count
+            self.db_seconds[view] += stats.db_time
+            self.render_seconds[view] += stats.render_time
+            self.duration_seconds[view] += duration
+            buckets = self.duration_buckets[view]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+            if repeated:
+                self.n_plus_one[view] += 1
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory and (
+            time.monotonic() - self.dumped >= settings.METRICS_DUMP_INTERVAL
+        ):
+            self.dump(directory)
+
+    def snapshot(self):
+        with self.lock:
+            data = {name: dict(getattr(self, name)) for name in self.COUNTERS}
+            data['duration_buckets'] = dict(self.duration_buckets)
+            return data
+
+    def merge(self, data):
+        with self.lock:
+            for name in self.COUNTERS:
+                values = getattr(self, name)
+                for view, value in data[name].items():
+                    values[view] += value
+            for view, counts in data['duration_buckets'].items():
+                buckets = self.duration_buckets[view]
+                for index, count in enumerate(counts[:len(buckets)]):
+                    buckets[index] += count
+
+    def dump(self, directory):
+        """Записывает суммы процесса в его файл, заменяя файл целиком."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.path is None or self.path.parent != directory:
+            # pid может достаться новому процессу, поэтому имя уникально.
+            self.path = directory / f'{self.pid}-{uuid.uuid4().hex}.json'
+        self.dumped = time.monotonic()
+        temporary = self.path.with_suffix(f'.{threading.get_ident()}.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, self.path)
+
+    @classmethod
+    def collect(cls, directory):
+        """Суммы всех процессов, записавших файлы в directory."""
+        total = cls()
+        for path in Path(directory).glob('*.json'):
+            try:
+                total.merge(json.loads(path.read_text()))
+            except (OSError, ValueError) as error:
+                logger.warning('Не прочитаны метрики %s: %s', path, error)
+        return total
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        with self.lock:
+            lines = []
+            for name, kind, description, values in (
+                ('requests_total', 'counter',
+                 'Обработанные запросы.', self.requests),
+                ('queries_total', 'counter',
+                 'SQL-запросы.', self.queries),
+                ('db_seconds_total', 'counter',
+                 'Время в базе данных.', self.db_seconds),
+                ('render_seconds_total', 'counter',
+                 'Время рендеринга шаблонов.', self.render_seconds),
+                ('n_plus_one_total', 'counter',
+                 'Запросы с повторяющимся SQL.', self.n_plus_one),
+            ):
+                lines.append(f'# HELP django_{name} {description}')
+                lines.append(f'# TYPE django_{name} {kind}')
+                for view, value in sorted(values.items()):
+                    lines.append(f'django_{name}{{view="{view}"}} {value}')
+            lines.append(
+                '# HELP django_request_duration_seconds Полное время запроса.'
+            )
+            lines.append('# TYPE django_request_duration_seconds histogram')
+            for view, buckets in sorted(self.duration_buckets.items()):
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(
+                        'django_request_duration_seconds_bucket'
+                        f'{{view="{view}",le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    'django_request_duration_seconds_bucket'
+                    f'{{view="{view}",le="+Inf"}} {self.requests[view]}'
+                )
+                lines.append(
+                    'django_request_duration_seconds_sum'
+                    f'{{view="{view}"}} {self.duration_seconds[view]}'
+                )
+                lines.append(
+                    'django_request_duration_seconds_count'
+                    f'{{view="{view}"}} {self.requests[view]}'
+                )
+            return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """
+    Измеряет стоимость запроса и ищет повторяющиеся SQL-запросы.
+
+    Время рендеринга измеряется для ответов-шаблонов, которые
+    рендерит обработчик Django. Асинхронные представления рендерят
+    шаблон сами, у них это время входит только в полное.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats = current_stats.get()
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats = current_stats.get()
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def start(self):
+        for connection in connections.all():
+            instrument(connection)
+        return current_stats.set(RequestStats())
+
+    def process_template_response(self, request, response):
+        stats = current_stats.get()
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                stats.render_time += time.perf_counter() - start
+
+        response.render = timed_render
+        return response
+
+    def finish(self, request, response, stats):
+        duration = time.perf_counter() - stats.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        repeated = stats.repeated_queries(settings.METRICS_N_PLUS_ONE_QUERIES)
+        for sql, count in repeated:
+            logger.warning(
+                'Возможный N+1 в %s: %d раз %s', view, count, sql
+            )
+        registry.add(view, stats, duration, repeated)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_time * 1000:.1f};'
+            f'desc="{stats.query_count} queries"',
+            f'render;dur={stats.render_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        return response
+
+
+def has_metrics_token(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and constant_time_compare(header, f'Bearer {token}')
+
+
+def metrics_view(request):
+    """
+    Суммы для Prometheus: для разрешённых адресов, персонала
+    и запросов с токеном METRICS_TOKEN.
+    """
+    if (
+        request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+        and not request.user.is_staff
+        and not has_metrics_token(request)
+    ):
+        return HttpResponseForbidden()
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory:
+        registry.dump(directory)
+        totals = Registry.collect(directory)
+    else:
+        totals = registry
+    return HttpResponse(
+        totals.render(), content_type='text/plain; version=0.0.4'
+    )
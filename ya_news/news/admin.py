@@ -1,6 +1,15 @@
+from django.conf import settings
 from django.contrib import admin
+from django.http import Http404, StreamingHttpResponse
+from django.urls import path
 
-from .models import Comment, News
+from .export import csv_lines, iter_news_with_comments, jsonl_lines
+from .models import BannedWord, Comment, News
+
+EXPORT_FORMATS = {
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
 
 
 class CommentInline(admin.StackedInline):
@@ -13,3 +22,36 @@ class NewsAdmin(admin.ModelAdmin):
     inlines = [
         CommentInline,
     ]
+    readonly_fields = ('comment_count',)
+    change_list_template = 'admin/news/news/change_list.html'
+
+    def get_urls(self):
+        return [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='news_news_export',
+            ),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        """Выгрузка всех новостей с комментариями, начинается сразу."""
+        if not self.has_view_permission(request):
+            raise Http404
+        export_format = request.GET.get('format', 'jsonl')
+        if export_format not in EXPORT_FORMATS:
+            raise Http404('Неизвестный формат.')
+        lines, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            lines(iter_news_with_comments(settings.EXPORT_CHUNK_SIZE)),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="news.{export_format}"'
+        )
+        return response
+
+
+@admin.register(BannedWord)
+class BannedWordAdmin(admin.ModelAdmin):
+    search_fields = ('word',)
@@ -1,7 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+from shared.db import apply_sqlite_pragmas
 
 
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from . import cache, search  # noqa: F401
+
+        connection_created.connect(apply_sqlite_pragmas)
+        post_migrate.connect(search.clear_flushed_index, sender=self)
@@ -0,0 +1,61 @@
+"""
+Асинхронные варианты страниц новостей для запуска под ASGI.
+
+Django 3.2 не умеет обращаться к ORM асинхронно, а синхронные
+представления под ASGI выполняются по очереди в одном общем потоке.
+Здесь работа с базой и рендеринг выполняются в отдельном пуле
+из ASYNC_DB_WORKERS потоков, поэтому запросы обрабатываются параллельно,
+а число одновременных соединений с базой ограничено размером пула.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .views import NewsDetailView, NewsList
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_WORKERS, thread_name_prefix='news-db'
+)
+
+
+def render_in_thread(view, request, *args, **kwargs):
+    """
+    Выполняет синхронное представление вместе с рендерингом шаблона.
+
+    Сигналы начала и конца запроса приходят в поток обработчика ASGI,
+    поэтому устаревшие соединения потоков пула закрываются здесь.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def pooled(view):
+    """Превращает синхронное представление в асинхронное на пуле потоков."""
+
+    async def async_view(request, *args, **kwargs):
+        # Переменные контекста, например маршрутизация запроса по базам,
+        # передаются в поток пула и возвращаются обратно.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(executor, partial(
+            context.run, render_in_thread, view, request, *args, **kwargs
+        ))
+        for variable, value in context.items():
+            variable.set(value)
+        return response
+
+    return async_view
+
+
+news_list = pooled(NewsList.as_view())
+news_detail = pooled(NewsDetailView.as_view())
@@ -0,0 +1,94 @@
+"""Кэширование страниц новостей для анонимных пользователей."""
+import uuid
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+CONTENT_VERSION_KEY = 'news:content-version'
+BAD_WORDS_VERSION_KEY = 'news:bad-words-version'
+# Псевдоним кэша, общего для всех процессов, см. CACHES в настройках.
+VERSIONS_CACHE = 'versions'
+# Заголовки, по которым проверяется условный запрос к странице из кэша.
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def get_version(key):
+    """Возвращает метку версии, создавая её при первом обращении."""
+    versions = caches[VERSIONS_CACHE]
+    version = versions.get(key)
+    if version is None:
+        versions.add(key, uuid.uuid4().hex, timeout=None)
+        version = versions.get(key)
+    return version
+
+
+def bump_version(key):
+    """Новая метка делает недействительным всё, что было на старой."""
+    caches[VERSIONS_CACHE].set(key, uuid.uuid4().hex, timeout=None)
+
+
+# Модели указаны строками: news.models сам меняет версию контента
+# при изменении счётчиков комментариев и импортирует этот модуль.
+# Удаление комментариев всегда меняет счётчики, поэтому обработчика
+# post_delete для Comment нет: он отключил бы быстрое каскадное удаление.
+@receiver(post_save, sender='news.News')
+@receiver(post_delete, sender='news.News')
+@receiver(post_save, sender='news.Comment')
+def invalidate_pages(sender, **kwargs):
+    bump_version(CONTENT_VERSION_KEY)
+
+
+@receiver(post_save, sender='news.BannedWord')
+@receiver(post_delete, sender='news.BannedWord')
+def invalidate_bad_words(sender, **kwargs):
+    bump_version(BAD_WORDS_VERSION_KEY)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Отдаёт анонимным пользователям страницу из кэша.
+
+    Ключ включает версию контента, поэтому после любого изменения
+    новостей или комментариев страницы рендерятся заново. Вместе
+    со страницей хранятся ETag и Last-Modified: условный запрос
+    к закэшированной странице проверяется без обращений к БД.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        key = 'news:response:{}:{}'.format(
+            get_version(CONTENT_VERSION_KEY), request.get_full_path()
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            content, validators = cached
+            response = HttpResponse(content)
+            for header, value in validators.items():
+                response[header] = value
+            return get_conditional_response(
+                request,
+                etag=validators.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    validators.get('Last-Modified')
+                ),
+                response=response,
+            )
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == HTTPStatus.OK:
+            response.add_post_render_callback(
+                lambda response: cache.set(key, (
+                    response.content,
+                    {
+                        header: response[header]
+                        for header in VALIDATOR_HEADERS if header in response
+                    },
+                ), settings.PAGE_CACHE_TIMEOUT)
+            )
+        return response
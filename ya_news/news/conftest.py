@@ -1,16 +1,55 @@
 # conftest.py
 import pytest
 from django.urls import reverse
-from news.models import News, Comment
+from news.cache import VERSIONS_CACHE
+from news.models import BannedWord, News, Comment
 from news.forms import BAD_WORDS
+from news.pytest_tests.snapshots import SnapshotStore
 
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import cache, caches
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
 from django.utils import timezone
 
 
 def pytest_configure():
     pytest.HOME_URL = reverse('news:home')
+    # Метки версий в тестах хранятся в памяти процесса:
+    # параллельные воркеры не должны сбрасывать кэш друг другу.
+    settings.CACHES[VERSIONS_CACHE] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': VERSIONS_CACHE,
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    caches[VERSIONS_CACHE].clear()
+
+
+@pytest.fixture
+def assert_budget(django_assert_max_num_queries):
+    """
+    GET-запрос, уложившийся в бюджет SQL-запросов и размера страницы.
+
+    Помогает заметить N+1 и списки без ограничения длины.
+    """
+    def check(client, url, max_queries, max_size, data=None):
+        with django_assert_max_num_queries(max_queries):
+            response = client.get(url, data)
+            # Потоковый ответ читает базу, пока отдаётся.
+            content = b''.join(response) if response.streaming else (
+                response.content
+            )
+        size = len(content)
+        assert size <= max_size, (
+            f'{url}: страница {size} байт, бюджет {max_size}'
+        )
+        return response
+    return check
 
 
 @pytest.fixture
@@ -48,6 +87,11 @@ def pk_for_args(news):
     return news.pk,
 
 
+@pytest.fixture
+def comment_pk_for_args(comment):
+    return comment.pk,
+
+
 @pytest.fixture
 def url_to_comment(news):
     new_url = reverse('news:detail', args=(news.id,))
@@ -64,29 +108,69 @@ def form_data(author):
 
 
 @pytest.fixture
-def bad_words_data(author):
-    return {'text': f'Какой-то текст, {BAD_WORDS[0]}, еще текст'}
+def banned_words(db):
+    """
+    Слова из миграции 0005_bannedword.
+
+    После транзакционных тестов база очищается, и при повторном
+    использовании тестовой базы (--reuse-db) этих слов в ней уже нет.
+    """
+    for word in BAD_WORDS:
+        BannedWord.objects.get_or_create(word=word)
 
 
 @pytest.fixture
-def news_list():
+def bad_words_data(author, banned_words):
+    return {'text': f'Какой-то текст, {BAD_WORDS[0]}, еще текст'}
+
+
+def build_news_list():
     today = datetime.today()
-    all_news = [
+    News.objects.bulk_create(
         News(
             title=f'Новость {index}',
             text='Просто текст.',
             date=today - timedelta(days=index))
         for index in range(settings.NEWS_COUNT_ON_HOME_PAGE + 1)
-    ]
-    return News.objects.bulk_create(all_news)
+    )
 
 
-@pytest.fixture
-def comment_list(news, author):
+def build_comment_list():
+    """Комментарии с разным временем создания к временной новости."""
+    news = News.objects.create(title='Новость', text='Текст')
+    author = get_user_model().objects.create(username='Комментатор')
     now = timezone.now()
     for index in range(2):
         comment = Comment.objects.create(
             news=news, author=author, text=f'Tекст {index}',
         )
-        comment.created = now + timedelta(days=index)
-        comment.save()
+        Comment.objects.filter(pk=comment.pk).update(
+            created=now + timedelta(days=index)
+        )
+
+
+@pytest.fixture(scope='session')
+def snapshots(django_db_setup, django_db_blocker, tmp_path_factory):
+    """Наборы данных, которые строятся один раз за сессию."""
+    with django_db_blocker.unblock():
+        store = SnapshotStore(
+            tmp_path_factory.mktemp('snapshots') / 'datasets.sqlite3'
+        )
+        store.build('news_list', build_news_list, (News,))
+        store.build('comment_list', build_comment_list, (Comment,))
+    yield store
+    connection_created.disconnect(store.attach)
+
+
+@pytest.fixture
+def news_list(db, snapshots):
+    keys = snapshots.restore('news_list')[News._meta.db_table]
+    return list(News.objects.filter(pk__in=keys))
+
+
+@pytest.fixture
+def comment_list(news, author, snapshots):
+    keys = snapshots.restore(
+        'comment_list', news_id=news.pk, author_id=author.pk
+    )[Comment._meta.db_table]
+    News.objects.change_comment_count({news.pk: len(keys)})
@@ -0,0 +1,96 @@
+"""Потоковая выгрузка новостей с комментариями в JSONL и CSV."""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, News
+
+NEWS_FIELDS = ('id', 'title', 'text', 'date', 'comment_count')
+COMMENT_FIELDS = ('id', 'author__username', 'text', 'created')
+CSV_FIELDS = (
+    'news_id', 'title', 'date',
+    'comment_id', 'comment_author', 'comment_text', 'comment_created',
+)
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CommentStream:
+    """
+    Комментарии всех новостей одним потоком в порядке (news_id, created).
+
+    Поток читается курсором порциями, в памяти - только текущая порция,
+    сколько бы комментариев ни было у одной новости.
+    """
+
+    def __init__(self, chunk_size):
+        self.rows = Comment.objects.order_by(
+            'news_id', 'created', 'pk'
+        ).values('news_id', *COMMENT_FIELDS).iterator(chunk_size=chunk_size)
+        self.current = next(self.rows, None)
+
+    def for_news(self, news_id):
+        """Комментарии новости; пропущенные ранее строки отбрасываются."""
+        while self.current is not None and self.current['news_id'] < news_id:
+            self.current = next(self.rows, None)
+        while self.current is not None and self.current['news_id'] == news_id:
+            comment, self.current = self.current, next(self.rows, None)
+            del comment['news_id']
+            yield comment
+
+
+def iter_news_with_comments(chunk_size):
+    """
+    Новости по порядку pk, у каждой - итератор её комментариев.
+
+    Новости и комментарии читаются двумя потоками, упорядоченными
+    по id новости, и сливаются на лету, поэтому память ограничена
+    размером порции. Комментарии новости нужно перебрать
+    до перехода к следующей.
+    """
+    comments = CommentStream(chunk_size)
+    for news in News.objects.order_by('pk').values(*NEWS_FIELDS).iterator(
+            chunk_size=chunk_size
+    ):
+        news['comments'] = comments.for_news(news['id'])
+        yield news
+
+
+def jsonl_lines(rows):
+    """
+    Новость - одна строка JSON, комментарии дописываются в неё по одному.
+    """
+    for row in rows:
+        comments = row.pop('comments')
+        line = json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder)
+        yield line[:-1] + ', "comments": ['
+        separator = ''
+        for comment in comments:
+            yield separator + json.dumps(
+                comment, ensure_ascii=False, cls=DjangoJSONEncoder
+            )
+            separator = ', '
+        yield ']}\n'
+
+
+def csv_lines(news_rows):
+    """Одна строка на комментарий, новости без комментариев - одной строкой."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for news in news_rows:
+        head = [news['id'], news['title'], news['date']]
+        empty = True
+        for comment in news['comments']:
+            empty = False
+            yield writer.writerow(head + [
+                comment['id'], comment['author__username'],
+                comment['text'], comment['created'].isoformat(),
+            ])
+        if empty:
+            yield writer.writerow(head + [''] * 4)
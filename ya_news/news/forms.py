@@ -1,14 +1,38 @@
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
-from .models import Comment
+from .cache import BAD_WORDS_VERSION_KEY, get_version
+from .models import BannedWord, Comment
+from .moderation import WordMatcher
 
+# Начальный список, дальше слова редактируются в админке.
 BAD_WORDS = (
     'редиска',
     'негодяй',
 )
 WARNING = 'Не ругайтесь!'
 
+_bad_words = (None, WordMatcher())
+
+
+def get_bad_words_matcher():
+    """
+    Автомат для запрещённых слов из БД.
+
+    Хранится в памяти процесса и собирается заново, только когда
+    меняется версия списка слов. Версия лежит в кэше, общем
+    для всех процессов, поэтому правка в админке доходит до каждого.
+    """
+    global _bad_words
+    version = get_version(BAD_WORDS_VERSION_KEY)
+    cached_version, matcher = _bad_words
+    if version != cached_version:
+        matcher = WordMatcher(
+            BannedWord.objects.values_list('word', flat=True)
+        )
+        _bad_words = (version, matcher)
+    return matcher
+
 
 class CommentForm(ModelForm):
 
@@ -19,8 +43,9 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        found = get_bad_words_matcher().find(text)
+        if found:
+            raise ValidationError(
+                WARNING, code='bad_words', params={'words': found}
+            )
         return text
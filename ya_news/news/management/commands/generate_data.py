@@ -0,0 +1,130 @@
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from news import search
+from news.cache import CONTENT_VERSION_KEY, bump_version
+from news.models import Comment, News
+from shared.datagen import GenerateDataCommand, zipf_counts
+
+COMMON_WORDS = (
+    'и', 'в', 'не', 'на', 'что', 'с', 'по', 'это', 'как', 'а', 'для', 'из',
+    'новость', 'город', 'год', 'день', 'люди', 'время', 'работа', 'жизнь',
+)
+NEWS_DAYS = 3 * 365
+COMMENT_DAYS = 7
+
+
+class Command(GenerateDataCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, новостями '
+        'и комментариями для замеров производительности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--news', type=int, default=100000)
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=1000000,
+            help='Сколько комментариев всего.',
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения комментариев по новостям.',
+        )
+        super().add_arguments(parser)
+
+    def handle(self, *args, users, news, comments, zipf, **options):
+        self.prepare((users, news, comments), COMMON_WORDS, **options)
+        if comments and not (users and news):
+            raise CommandError(
+                'Для комментариев нужны хотя бы один пользователь '
+                'и одна новость.'
+            )
+        user_ids = self.create_users(users)
+        first_pk = (
+            News.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        ) + 1
+        dates = self.create_news(first_pk, news)
+        counts = zipf_counts(
+            self.rng, news, comments, zipf, self.chunk_size
+        )
+        self.create_comments(first_pk, dates, counts, user_ids)
+        if search.is_available():
+            search.index_news_after(first_pk - 1, self.batch_size)
+        bump_version(CONTENT_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, новостей: {news}, '
+            f'комментариев: {comments}'
+        ))
+
+    def create_news(self, first_pk, count):
+        """Новости с заранее известными ключами, возвращает их даты."""
+        today = date.today()
+        dates = [
+            today - timedelta(days=self.rng.randrange(NEWS_DAYS))
+            for _ in range(count)
+        ]
+        self.save_in_chunks('Новости', News.objects, (
+            News(
+                pk=first_pk + index,
+                title=self.text.sentence(self.rng.randint(2, 6))[:50],
+                text=self.text.text(
+                    self.text.lognormal_length(120, 0.5, 2000)
+                ),
+                date=news_date,
+            )
+            for index, news_date in enumerate(dates)
+        ))
+        return dates
+
+    def create_comments(self, first_news_pk, dates, counts, user_ids):
+        """
+        Комментарии идут по новостям подряд, счётчики обновляются.
+
+        created и modified при вставке получают текущее время, поэтому
+        сгенерированное время проставляется после вставки каждой пачки.
+        """
+        now = timezone.now()
+        first_pk = (
+            Comment.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        ) + 1
+
+        def comments():
+            pk = first_pk
+            for index, (news_date, count) in enumerate(zip(dates, counts)):
+                start = timezone.make_aware(
+                    datetime.combine(news_date, datetime.min.time())
+                )
+                for _ in range(count):
+                    comment = Comment(
+                        pk=pk,
+                        news_id=first_news_pk + index,
+                        author_id=self.rng.choice(user_ids),
+                        text=self.text.text(
+                            self.text.lognormal_length(15, 0.8, 300)
+                        ),
+                    )
+                    comment.generated_at = min(now, start + timedelta(
+                        seconds=self.rng.randrange(COMMENT_DAYS * 86400)
+                    ))
+                    yield comment
+                    pk += 1
+
+        self.save_in_chunks(
+            'Комментарии', Comment.objects, comments(),
+            after_save=self.set_comment_times,
+        )
+
+    def set_comment_times(self, comments):
+        for comment in comments:
+            comment.created = comment.modified = comment.generated_at
+        Comment.objects.bulk_update(
+            comments, ('created', 'modified'), batch_size=self.batch_size
+        )
@@ -0,0 +1,239 @@
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from news import search
+from news.cache import CONTENT_VERSION_KEY, bump_version
+from news.models import News
+
+READ_SIZE = 64 * 1024
+FORMATS = {
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+}
+MAX_REPORTED_ERRORS = 20
+
+
+class JSONArrayReader:
+    """
+    Отдаёт элементы JSON-массива по одному.
+
+    Файл читается кусками, в памяти только текущий кусок
+    и разбираемый элемент.
+    """
+
+    def __init__(self, stream, read_size=READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read_more(self):
+        chunk = self.stream.read(self.read_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def next_char(self):
+        """Следующий непробельный символ, при необходимости дочитывает файл."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position].isspace()):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                raise ValueError('Неожиданный конец JSON.')
+            self.read_more()
+
+    def decode(self):
+        """Разбирает элемент, дочитывая файл, пока он не поместится."""
+        while True:
+            self.next_char()
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise ValueError(
+                        f'Некорректный JSON у позиции {self.position}.'
+                    )
+            else:
+                # Число в конце буфера может продолжаться в следующем куске.
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return item
+            self.read_more()
+
+    def __iter__(self):
+        if self.next_char() != '[':
+            raise ValueError('Ожидается JSON-массив.')
+        self.position += 1
+        if self.next_char() == ']':
+            return
+        while True:
+            yield self.decode()
+            char = self.next_char()
+            self.position += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f'Ожидается запятая, получено {char!r}.')
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    return iter(JSONArrayReader(stream, read_size))
+
+
+def iter_jsonl(stream):
+    """
+    Объекты по строкам файла.
+
+    Пустая строка даёт None, чтобы номер элемента совпадал с номером
+    строки, а строка с некорректным JSON - ValidationError вместо
+    объекта: она пропускается, как и другие некорректные строки.
+    """
+    for line in stream:
+        if not line.strip():
+            yield None
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            yield ValidationError(f'Некорректный JSON: {error.msg}.')
+
+
+def iter_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+READERS = {
+    'json': iter_json_array,
+    'jsonl': iter_jsonl,
+    'csv': iter_csv,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости из JSON (в том числе фикстур), '
+        'JSONL или CSV пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с новостями или - для stdin.')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию - по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять одним INSERT.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Сколько строк фиксировать одной транзакцией.',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Прервать загрузку на первой некорректной строке.',
+        )
+
+    def handle(self, *args, path, format, batch_size, chunk_size, strict,
+               **options):
+        if min(batch_size, chunk_size) < 1:
+            raise CommandError('Размеры пачек должны быть больше нуля.')
+        if format is None:
+            format = FORMATS.get(Path(path).suffix.lower())
+            if format is None:
+                raise CommandError('Укажите формат файла через --format.')
+        last_pk = News.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        try:
+            imported, errors = self.import_items(
+                READERS[format](stream), batch_size, chunk_size, strict
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Уже зафиксированные пачки индексируются и сбрасывают кэш,
+            # даже если загрузка прервалась на некорректной строке.
+            if search.is_available():
+                search.index_news_after(last_pk, batch_size)
+            bump_version(CONTENT_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено новостей: {imported}, пропущено строк: {errors}'
+        ))
+
+    def import_items(self, items, batch_size, chunk_size, strict):
+        started = time.monotonic()
+        imported = errors = 0
+        chunk = []
+        for number, item in enumerate(items, start=1):
+            if item is None:
+                continue
+            try:
+                if isinstance(item, ValidationError):
+                    raise item
+                chunk.append(self.build_news(item))
+            except ValidationError as error:
+                errors += 1
+                if strict:
+                    raise CommandError(f'Строка {number}: {error}')
+                if errors <= MAX_REPORTED_ERRORS:
+                    self.stderr.write(f'Строка {number}: {error}')
+                continue
+            if len(chunk) >= chunk_size:
+                imported += self.save_chunk(chunk, batch_size)
+                chunk = []
+                self.report(imported, started)
+        imported += self.save_chunk(chunk, batch_size)
+        self.report(imported, started)
+        return imported, errors
+
+    @staticmethod
+    def build_news(item):
+        """Проверяет строку; принимает и формат фикстур Django."""
+        fields = item.get('fields', item) if isinstance(item, dict) else None
+        if not isinstance(fields, dict):
+            raise ValidationError('Ожидается объект с полями новости.')
+        news = News(
+            title=fields.get('title') or '',
+            text=fields.get('text') or '',
+        )
+        if fields.get('date'):
+            news.date = fields['date']
+        news.full_clean(validate_unique=False)
+        return news
+
+    @staticmethod
+    def save_chunk(chunk, batch_size):
+        with transaction.atomic():
+            News.objects.bulk_create(chunk, batch_size=batch_size)
+        return len(chunk)
+
+    def report(self, imported, started):
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f'{imported} строк, {rate:.0f} строк/с')
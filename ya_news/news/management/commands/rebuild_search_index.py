@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт поисковый индекс новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько новостей индексировать за один запрос.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if not is_available():
+            raise CommandError(
+                'Таблица индекса не найдена: нужен SQLite с FTS5 '
+                'и применённые миграции.'
+            )
+        indexed = rebuild_index(batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано новостей: {indexed}')
+        )
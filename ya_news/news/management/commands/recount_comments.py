@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from news.models import Comment, News
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые счётчики комментариев у новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько новостей проверять за одну транзакцию.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        actual_count = Coalesce(Subquery(
+            Comment.objects.filter(news=OuterRef('pk')).order_by().values(
+                'news'
+            ).annotate(count=Count('pk')).values('count')
+        ), 0)
+        last_pk = 0
+        fixed = 0
+        while True:
+            pks = list(
+                News.objects.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                fixed += News.objects.filter(pk__in=pks).exclude(
+                    comment_count=actual_count
+                ).update(comment_count=actual_count)
+            last_pk = pks[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {fixed}')
+        )
@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS пуст.')
+        databases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != 'sqlite' for alias in databases):
+            raise CommandError(
+                'Синхронизация поддерживается только для SQLite.'
+            )
+        source = sqlite3.connect(
+            connections.databases[DEFAULT_DB_ALIAS]['NAME']
+        )
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                # Закрываем соединение процесса, чтобы не читать
+                # страницы старой копии.
+                connections[alias].close()
+                target = sqlite3.connect(connections.databases[alias]['NAME'])
+                try:
+                    # Копия согласована: backup читает одну транзакцию.
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(
+                    self.style.SUCCESS(f'Реплика {alias} обновлена')
+                )
+        finally:
+            source.close()
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    Comment = apps.get_model('news', 'Comment')
+    comment_count = Subquery(
+        Comment.objects.filter(news=OuterRef('pk')).order_by().values(
+            'news'
+        ).annotate(count=Count('pk')).values('count')
+    )
+    News.objects.update(comment_count=Coalesce(comment_count, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
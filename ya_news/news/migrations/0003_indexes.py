@@ -0,0 +1,27 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_news_comment_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='news',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='news.news'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['news', 'created'], name='comment_news_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-date'], name='news_date_desc_idx'),
+        ),
+    ]
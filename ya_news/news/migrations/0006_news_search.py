@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+from news.migrations._0006_stemmer import stem_text
+
+BATCH_SIZE = 1000
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Создаёт и заполняет индекс FTS5 из основ слов.
+
+    Если SQLite собран без FTS5 или база другая,
+    поиск будет работать через icontains.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE news_news_search USING fts5(title, text)'
+        )
+    except OperationalError:
+        return
+    News = apps.get_model('news', 'News')
+    rows = News.objects.values_list('pk', 'title', 'text').iterator(
+        chunk_size=BATCH_SIZE
+    )
+    with schema_editor.connection.cursor() as cursor:
+        batch = []
+        for pk, title, text in rows:
+            batch.append((pk, stem_text(title), stem_text(text)))
+            if len(batch) == BATCH_SIZE:
+                insert_rows(cursor, batch)
+                batch = []
+        insert_rows(cursor, batch)
+
+
+def insert_rows(cursor, rows):
+    cursor.executemany(
+        'INSERT INTO news_news_search (rowid, title, text) '
+        'VALUES (%s, %s, %s)',
+        rows,
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS news_news_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_bannedword'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,131 @@
+"""
+Копия news.stemmer на момент миграции 0006_news_search.
+
+Миграция не должна зависеть от кода приложения: если стеммер
+изменится, индекс пересоздаёт команда rebuild_search_index,
+а эта копия остаётся как есть. Имя с подчёркиванием,
+чтобы Django не принимал модуль за миграцию.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+TOKEN = re.compile(r'\w+')
+
+
+def _prepare(endings):
+    """Окончания группы от длинных к коротким с признаком «после а/я»."""
+    after_a, plain = endings
+    return sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in plain],
+        key=lambda candidate: -len(candidate[0]),
+    )
+
+
+PERFECTIVE_GERUND = _prepare(PERFECTIVE_GERUND)
+ADJECTIVE = _prepare(ADJECTIVE)
+PARTICIPLE = _prepare(PARTICIPLE)
+REFLEXIVE = _prepare(REFLEXIVE)
+VERB = _prepare(VERB)
+NOUN = _prepare(NOUN)
+DERIVATIONAL = _prepare(DERIVATIONAL)
+SUPERLATIVE = _prepare(SUPERLATIVE)
+I_ENDING = _prepare(((), ('и',)))
+SOFT_SIGN = _prepare(((), ('ь',)))
+
+
+def _regions(word):
+    """Начала областей RV и R2 в терминах алгоритма Snowball."""
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r1 = r2 = len(word)
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _remove(word, start, endings):
+    """
+    Отбрасывает самое длинное подходящее окончание, лежащее в word[start:].
+
+    Окончания с признаком «после а/я» отбрасываются, только если перед
+    ними стоит «а» или «я», сама эта буква остаётся.
+    """
+    for ending, needs_a in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if needs_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut], True
+    return word, False
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+
+    word, found = _remove(word, rv, PERFECTIVE_GERUND)
+    if not found:
+        word, _ = _remove(word, rv, REFLEXIVE)
+        word, found = _remove(word, rv, ADJECTIVE)
+        if found:
+            word, _ = _remove(word, rv, PARTICIPLE)
+        else:
+            word, found = _remove(word, rv, VERB)
+            if not found:
+                word, _ = _remove(word, rv, NOUN)
+
+    word, _ = _remove(word, rv, I_ENDING)
+    word, _ = _remove(word, r2, DERIVATIONAL)
+
+    word, found = _remove(word, rv, SUPERLATIVE)
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif not found:
+        word, _ = _remove(word, rv, SOFT_SIGN)
+    return word
+
+
+def stem_text(text):
+    """Текст в виде основ слов через пробел."""
+    return ' '.join(stem(token) for token in TOKEN.findall(text))
@@ -1,27 +1,127 @@
+from collections import Counter
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import CONTENT_VERSION_KEY, bump_version
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def change_comment_count(self, deltas):
+        """
+        Изменяет счётчики комментариев одним запросом.
+
+        deltas - словарь {id новости: на сколько изменить счётчик}.
+        Время изменения новостей и версия контента тоже обновляются,
+        чтобы закэшированные страницы не показывали старые счётчики.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        updated = self.filter(pk__in=deltas).update(
+            comment_count=F('comment_count') + Case(
+                *(When(pk=pk, then=Value(delta))
+                  for pk, delta in deltas.items()),
+                default=Value(0),
+            ),
+            modified=timezone.now(),
+        )
+        bump_version(CONTENT_VERSION_KEY)
+        return updated
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
+    # Меняется и при изменении комментариев: по нему строятся
+    # ETag и Last-Modified страницы новости.
+    modified = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date',), name='news_date_desc_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Счётчик комментариев меняет только change_comment_count.
+
+        Существующая новость сохраняется без него: значение, загруженное
+        вместе с объектом, затёрло бы комментарии, добавленные позже.
+        """
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+            ]
+        super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Создаёт комментарии пачкой и обновляет счётчики новостей."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            News.objects.change_comment_count(
+                Counter(comment.news_id for comment in objs)
+            )
+        return objs
+
+    def count_by_news(self):
+        """Сколько комментариев выборки приходится на каждую новость."""
+        return Counter(dict(
+            self.order_by().values_list('news_id').annotate(Count('pk'))
+        ))
+
+    def delete(self):
+        """
+        Удаляет комментарии и уменьшает счётчики новостей одним запросом.
+
+        Число комментариев по новостям считается агрегатом в БД,
+        сами комментарии в память не загружаются.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            deleted = self.count_by_news()
+            result = super().delete()
+            News.objects.change_comment_count(
+                {news_id: -count for news_id, count in deleted.items()}
+            )
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -29,9 +129,68 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('created',)
+        # Покрывает и выборку по news, поэтому отдельный индекс FK не нужен.
+        indexes = (
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        """
+        Новый комментарий увеличивает счётчик у новости,
+        изменённый - обновляет время изменения новости.
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                News.objects.change_comment_count({self.news_id: 1})
+            else:
+                News.objects.filter(pk=self.news_id).update(
+                    modified=timezone.now()
+                )
+
+    def delete(self, *args, **kwargs):
+        """Удалённый комментарий уменьшает счётчик у новости."""
+        with transaction.atomic(savepoint=False):
+            result = super().delete(*args, **kwargs)
+            News.objects.change_comment_count({self.news_id: -1})
+        return result
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def decrease_comment_count(sender, instance, **kwargs):
+    """
+    Уменьшает счётчики новостей перед удалением пользователя.
+
+    Его комментарии удаляются каскадом одним запросом без сигналов,
+    поэтому счётчики меняются здесь, внутри той же транзакции.
+    У Comment нет обработчиков удаления: иначе Django загружал бы
+    каждый удаляемый каскадом комментарий в память.
+    """
+    deleted = Comment.objects.filter(author=instance).count_by_news()
+    News.objects.change_comment_count(
+        {news_id: -count for news_id, count in deleted.items()}
+    )
+
+
+class BannedWord(models.Model):
+    word = models.CharField('Слово', max_length=100, unique=True)
+
+    class Meta:
+        ordering = ('word',)
+        verbose_name_plural = 'Запрещённые слова'
+        verbose_name = 'Запрещённое слово'
+
+    def __str__(self):
+        return self.word
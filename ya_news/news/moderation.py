@@ -0,0 +1,87 @@
+"""Поиск запрещённых слов за один проход по тексту (алгоритм Ахо-Корасик)."""
+import re
+from collections import deque
+
+# Латинские буквы и цифры, которыми подменяют похожие буквы кириллицы.
+HOMOGLYPHS = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у', 'ё': 'е',
+    '0': 'о', '3': 'з', '4': 'ч', '6': 'б', '@': 'а',
+})
+SEPARATORS = re.compile(r'[^\w\s]|_')
+REPEATS = re.compile(r'(\w)\1+')
+
+
+def normalize(text):
+    """
+    Приводит текст к виду, в котором ищутся слова.
+
+    Убирает регистр, подмену букв, знаки внутри слов («ре-ди.ска»)
+    и повторы букв («редиииска»).
+    """
+    text = text.lower().translate(HOMOGLYPHS)
+    return REPEATS.sub(r'\1', SEPARATORS.sub('', text))
+
+
+class WordMatcher:
+    """
+    Автомат для поиска сразу всех слов из списка.
+
+    Время поиска зависит только от длины текста, а не от размера списка.
+    При whole_words=True слово должно совпадать целиком,
+    иначе ищется любое вхождение, как простым `in`.
+    """
+
+    def __init__(self, words=(), whole_words=False):
+        self.whole_words = whole_words
+        self.load(words)
+
+    def load(self, words):
+        """Строит автомат заново для нового списка слов."""
+        goto, fail, output = [{}], [0], [[]]
+        for word in words:
+            key = normalize(word)
+            if not key:
+                continue
+            node = 0
+            for char in key:
+                if char not in goto[node]:
+                    goto[node][char] = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                node = goto[node][char]
+            output[node].append((word, len(key)))
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+        self._goto, self._fail, self._output = goto, fail, output
+
+    def _is_whole_word(self, text, start, end):
+        return (
+            (start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum())
+        )
+
+    def find(self, text):
+        """Возвращает найденные в тексте слова из списка без повторов."""
+        text = normalize(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        found = {}
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for word, length in output[node]:
+                if (not self.whole_words
+                        or self._is_whole_word(text, end - length, end)):
+                    found.setdefault(word)
+        return list(found)
@@ -0,0 +1,42 @@
+"""Постраничный вывод комментариев по ключу (created, id)."""
+from datetime import datetime
+
+from django.db.models import Q
+
+CURSOR_SEPARATOR = '_'
+# Наибольший первичный ключ, который SQLite примет как параметр запроса.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(comment):
+    """Курсор указывает на последний показанный комментарий."""
+    return f'{comment.created.isoformat()}{CURSOR_SEPARATOR}{comment.pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, при ошибке вызывает ValueError."""
+    created, _, pk = cursor.rpartition(CURSOR_SEPARATOR)
+    created, pk = datetime.fromisoformat(created), int(pk)
+    if created.tzinfo is None:
+        raise ValueError('В курсоре время без часового пояса.')
+    if not 0 < pk <= MAX_PK:
+        raise ValueError('Первичный ключ курсора вне допустимого диапазона.')
+    return created, pk
+
+
+def get_comments_page(comments, cursor=None, size=20):
+    """
+    Возвращает страницу комментариев и курсор следующей страницы.
+
+    Вместо OFFSET выбираются строки строго после курсора,
+    поэтому стоимость запроса не зависит от номера страницы.
+    """
+    comments = comments.order_by('created', 'pk')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        comments = comments.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        )
+    page = list(comments[:size + 1])
+    next_cursor = encode_cursor(page[size - 1]) if len(page) > size else None
+    return page[:size], next_cursor
@@ -0,0 +1,102 @@
+"""
+Снимки тестовых данных.
+
+Набор строк строится через ORM один раз за сессию в откатываемой
+транзакции и сохраняется в отдельный файл SQLite. Файл подключается
+к тестовой базе через ATTACH, и в каждом тесте строки копируются
+одним INSERT ... SELECT на таблицу внутри транзакции теста,
+которую pytest-django затем откатывает.
+"""
+import sqlite3
+from contextlib import closing
+
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+
+ALIAS = 'snapshots'
+
+
+class SnapshotStore:
+
+    def __init__(self, path):
+        self.path = str(path)
+        # Имя набора -> [(таблица, столбцы)].
+        self.datasets = {}
+        self.attach(connection)
+        connection_created.connect(self.attach)
+
+    def attach(self, connection, **kwargs):
+        # Напрямую через sqlite3, минуя обёртки Django: служебные
+        # запросы не попадают в число запросов представления.
+        raw = connection.connection
+        databases = raw.execute('PRAGMA database_list').fetchall()
+        if ALIAS not in {row[1] for row in databases}:
+            raw.execute(f'ATTACH DATABASE ? AS {ALIAS}', [str(self.path)])
+
+    def build(self, name, builder, models):
+        """
+        Сохраняет строки таблиц models, созданные функцией builder.
+
+        Первичный ключ в снимок не входит: при восстановлении
+        его назначает база, поэтому снимок не мешает строкам,
+        созданным в тесте раньше.
+        """
+        tables = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            builder()
+            for model in models:
+                columns = [
+                    field.column for field in model._meta.concrete_fields
+                    if not field.primary_key
+                ]
+                cursor.execute('SELECT {} FROM {} ORDER BY {}'.format(
+                    ', '.join(map(connection.ops.quote_name, columns)),
+                    connection.ops.quote_name(model._meta.db_table),
+                    connection.ops.quote_name(model._meta.pk.column),
+                ))
+                tables.append(
+                    (model._meta.db_table, columns, cursor.fetchall())
+                )
+            transaction.set_rollback(True)
+        with closing(sqlite3.connect(self.path)) as target, target:
+            for table, columns, rows in tables:
+                quoted = ', '.join(f'"{column}"' for column in columns)
+                target.execute(f'CREATE TABLE "{name}__{table}" ({quoted})')
+                target.executemany(
+                    'INSERT INTO "{}__{}" VALUES ({})'.format(
+                        name, table, ', '.join('?' * len(columns))
+                    ),
+                    rows,
+                )
+        self.datasets[name] = [
+            (table, columns) for table, columns, _ in tables
+        ]
+
+    def restore(self, name, **values):
+        """
+        Копирует набор name в тестовую базу.
+
+        values заменяют значения столбцов, например внешние ключи
+        на объекты из других фикстур. Возвращает для каждой таблицы
+        первичные ключи новых строк: одна вставка получает их подряд.
+        """
+        keys = {}
+        with connection.cursor() as cursor:
+            for table, columns in self.datasets[name]:
+                cursor.execute(
+                    'INSERT INTO main.{} ({}) SELECT {} FROM {}.{}'.format(
+                        connection.ops.quote_name(table),
+                        ', '.join(map(connection.ops.quote_name, columns)),
+                        ', '.join(
+                            '%s' if column in values
+                            else connection.ops.quote_name(column)
+                            for column in columns
+                        ),
+                        ALIAS,
+                        connection.ops.quote_name(f'{name}__{table}'),
+                    ),
+                    [values[column] for column in columns if column in values],
+                )
+                last = cursor.lastrowid
+                keys[table] = range(last - cursor.rowcount + 1, last + 1)
+        return keys
@@ -1,15 +1,27 @@
 # test_content.py
+import json
+from http import HTTPStatus
+
 import pytest
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from news.export import iter_news_with_comments, jsonl_lines
+from news.models import Comment, News
+from news.stemmer import stem
+from shared.metrics import Registry, RequestStats, normalize_sql, registry
+
 
 @pytest.mark.parametrize(
     'name, args',
     (
         ('news:detail', pytest.lazy_fixture('pk_for_args')),
-        ('news:edit', pytest.lazy_fixture('pk_for_args'))
+        ('news:edit', pytest.lazy_fixture('comment_pk_for_args'))
     )
 )
 def test_pages_contains_form_for_auth_user(
@@ -65,6 +77,26 @@ def test_news_order(client, news_list):
     assert all_dates == sorted_dates
 
 
+@pytest.mark.django_db
+def test_home_page_is_single_query(
+        client, news_list, author, django_assert_num_queries,
+):
+    """
+    Главная страница загружается одним запросом
+    независимо от количества комментариев.
+    """
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index, news in enumerate(News.objects.all())
+        for _ in range(index)
+    )
+    with django_assert_num_queries(1):
+        response = client.get(pytest.HOME_URL)
+    object_list = response.context['object_list']
+    for news in object_list:
+        assert news.comment_count == news.comment_set.count()
+
+
 @pytest.mark.django_db
 def test_comments_order(news, client, comment_list):
     """
@@ -77,3 +109,319 @@ def test_comments_order(news, client, comment_list):
     news = response.context['news']
     all_comments = news.comment_set.all()
     assert all_comments[0].created < all_comments[1].created
+
+
+@pytest.mark.django_db
+def test_comments_are_paginated_by_cursor(news, author, client, settings):
+    """
+    На странице новости выводится ограниченное число комментариев,
+    остальные подгружаются по курсору в порядке создания.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(5)
+    )
+    response = client.get(reverse('news:detail', args=(news.id,)))
+    shown = list(response.context['comments'])
+    cursor = response.context['next_cursor']
+    assert len(shown) == 2
+    while cursor:
+        response = client.get(
+            reverse('news:comments', args=(news.id,)), {'cursor': cursor}
+        )
+        shown += response.context['comments']
+        cursor = response.context['next_cursor']
+    assert shown == list(Comment.objects.filter(news=news).order_by(
+        'created', 'pk'
+    ))
+
+
+@pytest.mark.django_db
+def test_anonymous_home_page_is_cached_until_content_changes(
+        client, news, author, django_assert_num_queries,
+):
+    """
+    Повторный анонимный запрос главной отдаётся из кэша без запросов к БД,
+    новый комментарий сбрасывает кэш.
+    """
+    client.get(pytest.HOME_URL)
+    with django_assert_num_queries(0):
+        cached = client.get(pytest.HOME_URL)
+    assert 'Комментариев' not in cached.content.decode()
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response = client.get(pytest.HOME_URL)
+    assert 'Комментариев: 1' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_bulk_created_comments_reset_page_cache(client, news, author):
+    """
+    Комментарии, созданные пачкой, тоже сбрасывают кэш страниц.
+    """
+    client.get(pytest.HOME_URL)
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(3)
+    )
+    response = client.get(pytest.HOME_URL)
+    assert 'Комментариев: 3' in response.content.decode()
+
+
+def test_comment_fragment_is_rerendered_after_edit(
+        author_client, comment, pk_for_args,
+):
+    """
+    Закэшированный блок комментария обновляется после редактирования,
+    ссылки управления выводятся только автору.
+    """
+    url = reverse('news:detail', args=pk_for_args)
+    author_client.get(url)
+    Comment.objects.filter(pk=comment.pk).update(text='Без новой версии')
+    assert 'Без новой версии' not in author_client.get(url).content.decode()
+    comment.text = 'Исправленный текст'
+    comment.save()
+    content = author_client.get(url).content.decode()
+    assert 'Исправленный текст' in content
+    assert reverse('news:edit', args=(comment.pk,)) in content
+
+
+@pytest.mark.django_db
+def test_detail_page_supports_conditional_get(
+        client, news, author, django_assert_num_queries,
+):
+    """
+    Повторный запрос неизменённой новости получает 304 без рендеринга,
+    новый комментарий меняет ETag. ETag зависит от пользователя.
+    Анониму закэшированная страница и 304 по ней отдаются без запросов.
+    """
+    url = reverse('news:detail', args=(news.pk,))
+    response = client.get(url)
+    etag = response['ETag']
+    with django_assert_num_queries(0):
+        cached = client.get(url)
+    assert cached.content == response.content
+    assert cached['ETag'] == etag
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b''
+    with django_assert_num_queries(0):
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    cache.clear()
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    etag = response['ETag']
+    client.force_login(author)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert 'Last-Modified' not in response
+
+
+def get_query_plans(client, url):
+    """Планы выполнения всех запросов, сделанных при открытии страницы."""
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    with connection.cursor() as cursor:
+        plans = []
+        for query in context.captured_queries:
+            cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+            plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+    return plans
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name, args, index',
+    (
+        ('news:home', None, 'news_date_desc_idx'),
+        ('news:detail', pytest.lazy_fixture('pk_for_args'),
+         'comment_news_created_idx'),
+    )
+)
+def test_pages_use_indexes(client, news_list, comment, name, args, index):
+    """
+    Запросы главной страницы и страницы новости используют индексы
+    и не сортируют строки во временной таблице.
+    """
+    plans = get_query_plans(client, reverse(name, args=args))
+    assert any(f'USING INDEX {index}' in plan for plan in plans)
+    assert not any('TEMP B-TREE' in plan for plan in plans)
+
+
+@pytest.mark.parametrize(
+    'words',
+    (
+        ('новость', 'новости', 'новостей', 'новостями'),
+        ('популярный', 'популярного', 'популярными'),
+        ('создали', 'создал', 'создала'),
+    )
+)
+def test_stemmer_reduces_word_forms(words):
+    """
+    Разные формы слова сводятся к одной основе.
+    """
+    assert len({stem(word) for word in words}) == 1
+
+
+@pytest.mark.django_db
+def test_search_finds_news_by_word_forms(client, news):
+    """
+    Поиск находит новость по другим формам слов
+    и учитывает изменения и удаление новостей.
+    """
+    url = reverse('news:search')
+    other = News.objects.create(
+        title='Студенты создали приложение', text='Популярные новости.'
+    )
+    response = client.get(url, {'q': 'студентов'})
+    assert response.context['object_list'] == [other]
+    other.title = 'Выпускники'
+    other.save()
+    assert client.get(url, {'q': 'студентов'}).context['object_list'] == []
+    assert client.get(url, {'q': 'популярной новостью'}).context[
+        'object_list'
+    ] == [other]
+    other.delete()
+    assert client.get(url, {'q': 'новость'}).context['object_list'] == []
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index(client, news_list):
+    """
+    Команда rebuild_search_index восстанавливает индекс.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM news_news_search')
+    call_command('rebuild_search_index', batch_size=3)
+    response = client.get(reverse('news:search'), {'q': 'новости'})
+    assert len(response.context['object_list']) == len(news_list)
+
+
+@pytest.mark.django_db
+def test_admin_exports_news_with_comments(admin_client, news_list, comment):
+    """
+    Администратор получает потоковую выгрузку всех новостей
+    с их комментариями.
+    """
+    url = reverse('admin:news_news_export')
+    response = admin_client.get(url)
+    assert response.streaming
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    exported = [json.loads(line) for line in lines]
+    assert len(exported) == News.objects.count()
+    commented = next(
+        news for news in exported if news['id'] == comment.news_id
+    )
+    assert [item['text'] for item in commented['comments']] == [comment.text]
+    response = admin_client.get(url, {'format': 'csv'})
+    rows = b''.join(response.streaming_content).decode().splitlines()
+    assert len(rows) == News.objects.count() + 1
+
+
+@pytest.mark.django_db
+def test_export_merges_comment_stream_with_news(news_list, author):
+    """
+    Комментарии сливаются с новостями по порядку при любом размере
+    порции, непрочитанные комментарии новости пропускаются.
+    """
+    commented = news_list[1::2]
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'{news.pk}-{index}')
+        for news in commented
+        for index in range(3)
+    )
+    lines = ''.join(
+        jsonl_lines(iter_news_with_comments(chunk_size=2))
+    ).splitlines()
+    exported = [json.loads(line) for line in lines]
+    assert [news['id'] for news in exported] == sorted(
+        news.pk for news in news_list
+    )
+    for news in exported:
+        expected = [
+            f'{news["id"]}-{index}' for index in range(3)
+        ] if news['id'] in {item.pk for item in commented} else []
+        assert [item['text'] for item in news['comments']] == expected
+    skipped = [
+        next(news['comments'], None)
+        for news in iter_news_with_comments(chunk_size=2)
+    ]
+    assert [comment['text'] for comment in skipped if comment] == [
+        f'{news.pk}-0' for news in sorted(commented, key=lambda n: n.pk)
+    ]
+
+
+@pytest.mark.django_db
+def test_request_cost_is_exposed(client, news, comment_list):
+    """
+    Стоимость запроса видна в Server-Timing и в метриках по маршруту.
+    """
+    response = client.get(reverse('news:detail', args=(news.pk,)))
+    server_timing = response['Server-Timing']
+    assert server_timing.startswith('db;dur=')
+    assert 'render;dur=' in server_timing
+    metrics = client.get(reverse('metrics')).content.decode()
+    assert 'django_requests_total{view="news:detail"}' in metrics
+    assert 'django_request_duration_seconds_count{view="news:detail"}' in (
+        metrics
+    )
+
+
+@pytest.mark.django_db
+def test_metrics_are_summed_across_processes(
+        client, news, settings, tmp_path,
+):
+    """
+    С METRICS_DIR любой воркер отдаёт суммы всех процессов.
+    """
+    settings.METRICS_DIR = str(tmp_path)
+    other_process = Registry()
+    other_process.add('news:detail', RequestStats(), 0.01, [])
+    client.get(reverse('news:detail', args=(news.pk,)))
+    expected = registry.requests['news:detail'] + 1
+    metrics = client.get(reverse('metrics')).content.decode()
+    assert f'django_requests_total{{view="news:detail"}} {expected}\n' in (
+        metrics
+    )
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+
+@pytest.mark.django_db
+def test_metrics_behind_proxy_require_token(client, settings):
+    """
+    За прокси адрес клиента не проверить: метрики отдаются по токену.
+    """
+    settings.METRICS_ALLOWED_IPS = []
+    settings.METRICS_TOKEN = 'secret'
+    url = reverse('metrics')
+    assert client.get(url).status_code == HTTPStatus.FORBIDDEN
+    assert client.get(
+        url, HTTP_AUTHORIZATION='Bearer wrong'
+    ).status_code == HTTPStatus.FORBIDDEN
+    assert client.get(
+        url, HTTP_AUTHORIZATION='Bearer secret'
+    ).status_code == HTTPStatus.OK
+
+
+def test_repeated_queries_are_flagged():
+    """
+    Запросы, отличающиеся только параметрами, считаются одинаковыми.
+    """
+    stats = RequestStats()
+    for size in range(1, 6):
+        placeholders = ', '.join(['%s'] * size)
+        stats.queries[normalize_sql(
+            f'SELECT * FROM news_comment WHERE id IN ({placeholders})'
+        )] += 1
+    stats.queries[normalize_sql('SELECT * FROM news_news LIMIT 10')] += 1
+    assert stats.repeated_queries(5) == [
+        ('SELECT * FROM news_comment WHERE id IN (...)', 5),
+    ]
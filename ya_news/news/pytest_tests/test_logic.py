@@ -1,11 +1,30 @@
+import io
+import json
+
 import pytest
 from http import HTTPStatus
 from pytest_django.asserts import assertFormError, assertRedirects
 
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, F
+from django.http import HttpResponse
 from django.urls import reverse
 
-from news.forms import WARNING
-from news.models import Comment
+from news.cache import BAD_WORDS_VERSION_KEY, VERSIONS_CACHE
+from news.forms import WARNING, CommentForm, get_bad_words_matcher
+from news.management.commands.import_news import iter_json_array
+from news.models import BannedWord, Comment, News
+from news.moderation import WordMatcher
+from news.search import SEARCH_TABLE
+from yanews.routers import (
+    PIN_COOKIE, PrimaryPinMiddleware, ReplicaRouter, RequestRouting,
+    request_routing,
+)
+
+from shared.db import apply_sqlite_pragmas
 
 
 def test_user_can_create_comment(
@@ -98,3 +117,397 @@ def test_user_cannot_use_badwords_in_comment(
     )
     comments_count = Comment.objects.count()
     assert comments_count == 0
+
+
+def test_comment_count_follows_comments(
+        author_client, news, form_data, pk_for_args,
+):
+    """
+    Счётчик комментариев новости меняется
+    при создании и удалении комментария.
+    """
+    author_client.post(reverse('news:detail', args=pk_for_args), form_data)
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    comment = Comment.objects.get()
+    author_client.post(reverse('news:delete', args=(comment.id,)))
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_bulk_comment_delete_updates_counts_at_once(
+        news_list, author, django_user_model, django_assert_num_queries,
+):
+    """
+    Удаление пачки комментариев и каскадное удаление автора
+    меняют счётчики одним запросом, а не по запросу на комментарий.
+    """
+    reader = django_user_model.objects.create(username='Читатель')
+    Comment.objects.bulk_create(
+        Comment(news=news, author=user, text='Текст')
+        for news in news_list
+        for user in (author, reader)
+        for _ in range(5)
+    )
+    # Подсчёт по новостям, удаление и обновление счётчиков.
+    with django_assert_num_queries(3):
+        Comment.objects.filter(author=author).delete()
+    reader.delete()
+    assert not Comment.objects.exists()
+    assert not News.objects.exclude(comment_count=0).exists()
+
+
+@pytest.mark.django_db
+def test_saving_stale_news_keeps_comment_count(news, author):
+    """
+    Сохранение новости, загруженной до нового комментария,
+    не затирает счётчик.
+    """
+    stale = News.objects.get(pk=news.pk)
+    Comment.objects.create(news=news, author=author, text='Текст')
+    stale.title = 'Новый заголовок'
+    stale.save()
+    news.refresh_from_db()
+    assert news.title == 'Новый заголовок'
+    assert news.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_recount_comments_repairs_drift(news, comment):
+    """
+    Команда recount_comments исправляет рассинхронизированные счётчики.
+    """
+    News.objects.update(comment_count=5)
+    call_command('recount_comments', batch_size=1)
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+@pytest.mark.parametrize(
+    'text',
+    (
+        'Ты РЕДИСКА!',
+        'ре-ди.ска',
+        'редииииска',
+        'pедискa',
+        'нег0дяй',
+    )
+)
+def test_user_cannot_use_obfuscated_badwords(
+        author_client, pk_for_args, text, banned_words,
+):
+    """
+    Запрещённые слова находятся и при попытке их замаскировать.
+    """
+    url = reverse('news:detail', args=pk_for_args)
+    response = author_client.post(url, data={'text': text})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    assert Comment.objects.count() == 0
+
+
+def test_word_matcher_reports_matched_words():
+    """
+    Автомат возвращает все найденные слова,
+    в режиме целых слов пропускает вхождения внутри других слов.
+    """
+    words = ('дис', 'редиска', 'негодяй')
+    text = 'Редиска пошла на дискотеку'
+    assert WordMatcher(words).find(text) == ['дис', 'редиска']
+    assert WordMatcher(words, whole_words=True).find(text) == ['редиска']
+
+
+@pytest.mark.django_db
+def test_bad_words_check_does_not_query_database(
+        django_assert_num_queries, banned_words,
+):
+    """
+    Список запрещённых слов читается из БД один раз,
+    дальше проверка идёт по автомату в памяти.
+    """
+    CommentForm(data={'text': 'Текст'}).is_valid()
+    with django_assert_num_queries(0):
+        assert not CommentForm(data={'text': 'Ты редиска'}).is_valid()
+
+
+@pytest.mark.django_db
+def test_banned_words_version_is_shared_between_workers(banned_words):
+    """
+    Версия списка слов берётся из общего кэша: если её сменил
+    другой процесс, автомат собирается заново.
+    """
+    assert not get_bad_words_matcher().find('Кабачок')
+    BannedWord.objects.bulk_create([BannedWord(word='кабачок')])
+    caches[VERSIONS_CACHE].set(BAD_WORDS_VERSION_KEY, 'другой воркер')
+    assert get_bad_words_matcher().find('Кабачок') == ['кабачок']
+
+
+def test_new_banned_word_applies_immediately(author_client, pk_for_args):
+    """
+    Слово, добавленное модератором, сразу запрещено в комментариях.
+    """
+    url = reverse('news:detail', args=pk_for_args)
+    author_client.post(url, data={'text': 'Кабачок'})
+    BannedWord.objects.create(word='кабачок')
+    response = author_client.post(url, data={'text': 'Ты кабачок'})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    assert Comment.objects.count() == 1
+
+
+@pytest.mark.parametrize(
+    'name, args, data, max_queries',
+    (
+        # Сессия, пользователь, новость, вставка и счётчик в savepoint.
+        ('news:detail', pytest.lazy_fixture('pk_for_args'),
+         {'text': 'Новый текст'}, 7),
+        # Сессия, пользователь, комментарий,
+        # обновление и время изменения новости в savepoint.
+        ('news:edit', pytest.lazy_fixture('comment_pk_for_args'),
+         {'text': 'Новый текст'}, 7),
+        # Сессия, пользователь, комментарий, удаление, счётчик.
+        ('news:delete', pytest.lazy_fixture('comment_pk_for_args'), {}, 5),
+    )
+)
+def test_write_endpoints_query_count(
+        author_client, django_assert_max_num_queries,
+        name, args, data, max_queries,
+):
+    """
+    Запись комментария не загружает объекты повторно
+    для адреса перенаправления.
+    """
+    get_bad_words_matcher()
+    with django_assert_max_num_queries(max_queries):
+        response = author_client.post(reverse(name, args=args), data)
+    assert response.status_code == HTTPStatus.FOUND
+
+
+IMPORT_ROWS = (
+    {'title': 'Первая новость', 'text': 'Текст', 'date': '2023-01-02'},
+    {'title': 'Вторая новость', 'text': 'Текст', 'date': '2023-01-01'},
+    {'title': '', 'text': 'Новость без заголовка'},
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'suffix, content',
+    (
+        ('.json', json.dumps(
+            [{'model': 'news.news', 'fields': row} for row in IMPORT_ROWS]
+        )),
+        ('.jsonl', '\n'.join(json.dumps(row) for row in IMPORT_ROWS)),
+        ('.csv', 'title,text,date\n' + '\n'.join(
+            ','.join(row.get(field, '') for field in ('title', 'text', 'date'))
+            for row in IMPORT_ROWS
+        )),
+    )
+)
+def test_import_news(tmp_path, client, suffix, content):
+    """
+    Команда import_news загружает корректные строки,
+    пропускает некорректные и добавляет новости в поиск.
+    """
+    path = tmp_path / f'news{suffix}'
+    path.write_text(content, encoding='utf-8')
+    call_command(
+        'import_news', str(path), batch_size=1, chunk_size=1,
+        stdout=io.StringIO(), stderr=io.StringIO(),
+    )
+    assert list(News.objects.values_list('title', flat=True)) == [
+        'Первая новость', 'Вторая новость',
+    ]
+    response = client.get(reverse('news:search'), {'q': 'вторые'})
+    assert len(response.context['object_list']) == 1
+
+
+@pytest.mark.django_db
+def test_strict_import_indexes_committed_chunks(tmp_path, client):
+    """
+    Прерванная в режиме --strict загрузка оставляет в поиске
+    уже сохранённые пачки, строка не-объект считается некорректной.
+    """
+    path = tmp_path / 'news.jsonl'
+    path.write_text('\n'.join(
+        json.dumps(row) for row in (*IMPORT_ROWS[:2], ['не объект'])
+    ), encoding='utf-8')
+    with pytest.raises(CommandError, match='Строка 3'):
+        call_command(
+            'import_news', str(path), strict=True, chunk_size=1,
+            stdout=io.StringIO(),
+        )
+    assert News.objects.count() == 2
+    response = client.get(reverse('news:search'), {'q': 'вторые'})
+    assert len(response.context['object_list']) == 1
+
+
+@pytest.mark.django_db
+def test_import_skips_malformed_jsonl_lines(tmp_path):
+    """
+    Строка JSONL с некорректным JSON пропускается с номером строки
+    файла, в режиме --strict загрузка на ней прерывается.
+    """
+    path = tmp_path / 'news.jsonl'
+    path.write_text(
+        json.dumps(IMPORT_ROWS[0]) + '\n\n{не json\n'
+        + json.dumps(IMPORT_ROWS[1]) + '\n',
+        encoding='utf-8',
+    )
+    stderr = io.StringIO()
+    call_command(
+        'import_news', str(path), stdout=io.StringIO(), stderr=stderr,
+    )
+    assert News.objects.count() == 2
+    assert stderr.getvalue().startswith('Строка 3: ')
+    with pytest.raises(CommandError, match='Строка 3'):
+        call_command(
+            'import_news', str(path), strict=True, stdout=io.StringIO(),
+        )
+
+
+@pytest.mark.parametrize('option', ('batch_size', 'chunk_size'))
+def test_import_rejects_empty_batches(tmp_path, option):
+    """
+    Нулевой размер пачки - ошибка команды, а не AssertionError
+    или фиксация по одной строке.
+    """
+    with pytest.raises(CommandError):
+        call_command(
+            'import_news', str(tmp_path / 'news.jsonl'), **{option: 0},
+        )
+
+
+def test_json_array_is_parsed_in_small_pieces():
+    """
+    Элементы массива разбираются, даже если не помещаются в буфер чтения.
+    """
+    items = [
+        {'title': 'Новость' * index, 'text': [index]} for index in range(5)
+    ] + [12345]
+    stream = io.StringIO(' [ ' + ' , '.join(map(json.dumps, items)) + ' ] ')
+    assert list(iter_json_array(stream, read_size=3)) == items
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_are_applied(settings):
+    """
+    При подключении выполняются PRAGMA из настройки SQLITE_PRAGMAS.
+    """
+    settings.SQLITE_PRAGMAS = {'cache_size': -1234}
+    apply_sqlite_pragmas(sender=None, connection=connection)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        assert cursor.fetchone() == (-1234,)
+
+
+def test_router_reads_replicas_until_first_write(settings):
+    """
+    Новости читаются с одной реплики на запрос, после записи
+    в запросе - с основной базы. Вне запроса реплики не используются.
+    """
+    settings.DATABASE_REPLICAS = ['replica1', 'replica2']
+    router = ReplicaRouter()
+    assert router.db_for_write(Comment) == 'default'
+    assert router.db_for_read(News) == 'default'
+    routing = RequestRouting()
+    token = request_routing.set(routing)
+    try:
+        assert {router.db_for_read(News) for _ in range(20)} == {
+            routing.replica
+        }
+        assert router.db_for_read(get_user_model()) == 'default'
+        assert router.db_for_write(Comment) == 'default'
+        assert router.db_for_read(News) == 'default'
+    finally:
+        request_routing.reset(token)
+    assert request_routing.get() is None
+    assert not router.allow_migrate('replica1', 'news')
+
+
+def test_primary_pin_is_limited_to_request(settings, rf):
+    """
+    Запись закрепляет основную базу только до конца запроса,
+    следующему запросу об этом сообщает кука.
+    """
+    settings.DATABASE_REPLICAS = ['replica']
+
+    def write(request):
+        ReplicaRouter().db_for_write(Comment)
+        return HttpResponse()
+
+    response = PrimaryPinMiddleware(write)(rf.post('/'))
+    assert PIN_COOKIE in response.cookies
+    assert request_routing.get() is None
+    response = PrimaryPinMiddleware(lambda request: HttpResponse())(
+        rf.get('/')
+    )
+    assert PIN_COOKIE not in response.cookies
+
+
+@pytest.mark.django_db(transaction=True)
+def test_user_can_create_comment_via_async_view(
+        author_client, form_data, pk_for_args,
+):
+    """
+    Асинхронная страница новости принимает комментарии.
+    """
+    url = reverse('news:async_detail', args=pk_for_args)
+    response = author_client.post(url, data=form_data)
+    assert response.status_code == HTTPStatus.FOUND
+    assert Comment.objects.get().text == form_data['text']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_clears_search_index(news):
+    """
+    flush после транзакционных тестов очищает и индекс поиска,
+    иначе в сохранённой тестовой базе оставались бы чужие строки.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        assert cursor.fetchone() == (0,)
+
+
+@pytest.mark.django_db
+def test_generate_data(client):
+    """
+    Команда generate_data создаёт данные с согласованными счётчиками
+    комментариев, новые новости попадают в поиск.
+    """
+    call_command(
+        'generate_data', users=3, news=20, comments=200, batch_size=7,
+        chunk_size=50, stdout=io.StringIO(),
+    )
+    assert News.objects.count() == 20
+    assert Comment.objects.count() == 200
+    assert not News.objects.annotate(
+        total=Count('comment')
+    ).exclude(comment_count=F('total')).exists()
+    assert not Comment.objects.exclude(created=F('modified')).exists()
+    assert Comment.objects.values('created').distinct().count() > 1
+    news = News.objects.first()
+    response = client.get(
+        reverse('news:search'), {'q': news.title.split()[0]}
+    )
+    assert news in response.context['object_list']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'options',
+    (
+        {'users': 0, 'news': 5, 'comments': 10},
+        {'users': 3, 'news': 0, 'comments': 10},
+        {'users': -1, 'news': 5, 'comments': 0},
+        {'users': 3, 'news': 5, 'comments': 10, 'batch_size': 0},
+    )
+)
+def test_generate_data_rejects_impossible_options(options):
+    """
+    Комментарии без новостей или авторов и отрицательные количества
+    дают понятную ошибку команды.
+    """
+    with pytest.raises(CommandError):
+        call_command('generate_data', stdout=io.StringIO(), **options)
+    assert not Comment.objects.exists()
@@ -1,10 +1,31 @@
 # test_routes.py
+import re
+
 import pytest
 from http import HTTPStatus
 from pytest_django.asserts import assertRedirects
 
 from django.urls import reverse
 
+from news.search import index_news
+
+# Бюджеты страниц: не больше стольких SQL-запросов и байт в ответе.
+BUDGETS = {
+    'news:home': (1, 5000),
+    'news:detail': (2, 3000),
+    'news:comments': (1, 1000),
+    'news:search': (0, 2000),
+    'news:search?q': (2, 4000),
+    'news:edit': (4, 2500),
+    'news:delete': (4, 2500),
+    'news:async_home': (1, 5000),
+    'news:async_detail': (2, 3000),
+    'users:login': (0, 4000),
+    'users:logout': (0, 2000),
+    'users:signup': (0, 5000),
+}
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
@@ -15,18 +36,37 @@ from django.urls import reverse
         ('users:logout', None),
         ('users:signup', None),
         ('news:detail', pytest.lazy_fixture('pk_for_args')),
+        ('news:comments', pytest.lazy_fixture('pk_for_args')),
+        ('news:search', None),
     )
 )
-def test_pages_availability_for_anonymous_user(client, name, args):
+def test_pages_availability_for_anonymous_user(
+        client, name, args, news_list, comment_list, assert_budget,
+):
     """
     Страницы домашняя, логина, логаута, регистрации, отдельной новости
     доступны неавторизованному пользователю.
     """
     url = reverse(name, args=args)
-    response = client.get(url)
+    response = assert_budget(client, url, *BUDGETS[name])
     assert response.status_code == HTTPStatus.OK
 
 
+@pytest.mark.django_db
+def test_search_results_within_budget(client, news_list, assert_budget):
+    """
+    Поиск с найденными новостями: один запрос к индексу
+    и один за самими новостями.
+    """
+    index_news(news_list)
+    response = assert_budget(
+        client, reverse('news:search'), *BUDGETS['news:search?q'],
+        data={'q': 'новость'},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.context['object_list']) == len(news_list)
+
+
 @pytest.mark.parametrize(
     'parametrized_client, expected_status',
     (
@@ -43,12 +83,13 @@ def test_pages_availability_for_anonymous_user(client, name, args):
 )
 def test_comment_pages_availability_for_different_users(
         parametrized_client, name, news, expected_status, comment,
+        assert_budget,
 ):
     """
     Страницы редактирования и удаления комментария доступны только автору.
     """
     url = reverse(name, args=(comment.id,))
-    response = parametrized_client.get(url)
+    response = assert_budget(parametrized_client, url, *BUDGETS[name])
     assert response.status_code == expected_status
 
 
@@ -60,7 +101,7 @@ def test_comment_pages_availability_for_different_users(
         ('news:delete', pytest.lazy_fixture('pk_for_args')),
     )
 )
-def test_redirects_for_anonymous_user(client, name, args):
+def test_redirects_for_anonymous_user(client, name, args, assert_budget):
     """
     Неавторизованный пользователь
     не может редактировать и удалять комментарии
@@ -70,5 +111,59 @@ def test_redirects_for_anonymous_user(client, name, args):
     login_url = reverse('users:login')
     url = reverse(name, args=args)
     expected_url = f'{login_url}?next={url}'
-    response = client.get(url)
+    response = assert_budget(client, url, *BUDGETS[name])
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    'name, args',
+    (
+        ('news:async_home', None),
+        ('news:async_detail', pytest.lazy_fixture('pk_for_args')),
+    )
+)
+def test_async_pages_availability_for_anonymous_user(
+        client, name, args, news_list, comment_list,
+):
+    """
+    Асинхронные варианты главной и отдельной новости работают
+    в потоках пула, поэтому данные в базе должны быть сохранены.
+
+    Запросы из потоков пула не видит django_assert_num_queries,
+    поэтому их число берётся из Server-Timing: MetricsMiddleware
+    считает запросы всех соединений.
+    """
+    url = reverse(name, args=args)
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    max_queries, max_size = BUDGETS[name]
+    queries = int(SERVER_TIMING_QUERIES.search(
+        response['Server-Timing']
+    ).group(1))
+    assert queries <= max_queries, (
+        f'{url}: запросов {queries}, бюджет {max_queries}'
+    )
+    assert len(response.content) <= max_size, (
+        f'{url}: страница {len(response.content)} байт, бюджет {max_size}'
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'cursor',
+    (
+        'не курсор',
+        '2024-01-01T00:00:00+00:00_' + '9' * 25,
+        '2024-01-01T00:00:00+00:00_-1',
+        '2024-01-01T00:00:00_1',
+    )
+)
+def test_invalid_comments_cursor_returns_404(client, pk_for_args, cursor):
+    """
+    Некорректный курсор комментариев, в том числе с огромным ключом
+    или временем без часового пояса, даёт 404, а не ошибку сервера.
+    """
+    url = reverse('news:comments', args=pk_for_args)
+    response = client.get(url, {'cursor': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,123 @@
+"""
+Поиск по новостям с учётом русской морфологии.
+
+Индекс - таблица SQLite FTS5 в той же базе данных, в ней хранятся
+основы слов заголовка и текста. Запрос сводится к тем же основам,
+поэтому «новостей» находит и «новость», и «новости».
+"""
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import News
+from .stemmer import TOKEN, stem, stem_text
+
+SEARCH_TABLE = 'news_news_search'
+TITLE_WEIGHT = 10.0
+
+_available = None
+
+
+def is_available():
+    global _available
+    if _available is None:
+        _available = SEARCH_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_news(news_items):
+    """Добавляет или обновляет новости в индексе."""
+    rows = [
+        (news.pk, stem_text(news.title), stem_text(news.text))
+        for news in news_items
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [(pk,) for pk, _, _ in rows],
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, text) '
+            'VALUES (%s, %s, %s)',
+            rows,
+        )
+
+
+def index_news_after(last_pk=0, batch_size=1000):
+    """Индексирует новости с pk больше last_pk, читая их пачками."""
+    indexed = 0
+    while True:
+        batch = list(
+            News.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                'pk', 'title', 'text'
+            )[:batch_size]
+        )
+        if not batch:
+            return indexed
+        index_news(batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+def rebuild_index(batch_size=1000):
+    """Пересоздаёт индекс целиком."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    return index_news_after(0, batch_size)
+
+
+def search_news(query, limit=20):
+    """Новости по запросу, самые подходящие первыми."""
+    words = TOKEN.findall(query)
+    if not words:
+        return []
+    if not is_available():
+        condition = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(text__icontains=word)
+        return list(News.objects.filter(condition)[:limit])
+    match = ' '.join(f'"{stem(word)}"' for word in words)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s '
+            f'ORDER BY bm25({SEARCH_TABLE}, %s, 1.0) LIMIT %s',
+            [match, TITLE_WEIGHT, limit],
+        )
+        pks = [pk for pk, in cursor.fetchall()]
+    found = News.objects.in_bulk(pks)
+    return [found[pk] for pk in pks if pk in found]
+
+
+def clear_flushed_index(using, **kwargs):
+    """
+    Очищает индекс, если новостей в базе нет.
+
+    flush, которым база очищается после транзакционных тестов,
+    не знает о таблице FTS5, и в ней оставались бы строки удалённых
+    новостей, в том числе в тестовой базе, переживающей запуск
+    (--reuse-db). После flush и migrate Django шлёт post_migrate.
+    """
+    db = connections[using]
+    if (
+        SEARCH_TABLE in db.introspection.table_names()
+        and not News.objects.using(using).exists()
+    ):
+        with db.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+
+@receiver(post_save, sender=News)
+def update_search_index(sender, instance, **kwargs):
+    if is_available():
+        index_news([instance])
+
+
+@receiver(post_delete, sender=News)
+def remove_from_search_index(sender, instance, **kwargs):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [instance.pk]
+            )
@@ -1,16 +1,28 @@
 from django.urls import path
 
-from news import views
+from news import async_views, views
 
 app_name = 'news'
 
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path(
+        'news/<int:pk>/comments/',
+        views.NewsCommentList.as_view(),
+        name='comments'
+    ),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
         name='delete'
     ),
     path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
+    path('async/', async_views.news_list, name='async_home'),
+    path(
+        'async/news/<int:pk>/',
+        async_views.news_detail,
+        name='async_detail'
+    ),
 ]
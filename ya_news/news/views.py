@@ -1,14 +1,21 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .cache import AnonymousPageCacheMixin
 from .forms import CommentForm
 from .models import Comment, News
+from .pagination import get_comments_page
+from .search import search_news
 
 
-class NewsList(generic.ListView):
+class NewsList(AnonymousPageCacheMixin, generic.ListView):
     """Список новостей."""
     model = News
     template_name = 'news/home.html'
@@ -18,32 +25,140 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Количество комментариев хранится в самой новости,
+        сами комментарии не загружаются.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+
+class CommentsPageMixin:
+    """Загрузка одной страницы комментариев к новости."""
+
+    def get_comments_page(self, news_pk, cursor=None):
+        try:
+            comments, next_cursor = get_comments_page(
+                Comment.objects.filter(
+                    news_id=news_pk
+                ).select_related('author'),
+                cursor,
+                settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+            )
+        except ValueError:
+            raise Http404('Некорректный курсор.')
+        return {
+            'news_pk': news_pk,
+            'comments': comments,
+            'next_cursor': next_cursor,
+        }
+
+
+class NewsSearch(generic.TemplateView):
+    """Поиск по заголовкам и текстам новостей."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['object_list'] = search_news(
+            query, settings.NEWS_SEARCH_RESULTS
+        ) if query else []
+        return context
 
 
-class NewsDetail(generic.DetailView):
+def get_news(request, pk):
+    """
+    Новость, загруженная один раз за запрос.
+
+    По ней строятся ETag и Last-Modified, и её же выводит страница,
+    поэтому условный запрос не добавляет обращений к БД.
+    """
+    if not hasattr(request, 'news'):
+        request.news = News.objects.filter(pk=pk).first()
+    return request.news
+
+
+def news_etag(request, pk):
+    """
+    Страница зависит от пользователя: у автора есть ссылки управления,
+    а в форме - CSRF-токен, поэтому они тоже входят в ETag.
+    """
+    news = get_news(request, pk)
+    if news is None:
+        return None
+    return hashlib.md5('{}:{}:{}:{}'.format(
+        news.pk,
+        news.modified.isoformat(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ).encode()).hexdigest()
+
+
+def news_last_modified(request, pk):
+    """
+    Только для анонимов: If-Modified-Since не знает о пользователе,
+    и после входа браузер получил бы 304 на анонимную страницу.
+    """
+    news = get_news(request, pk)
+    if news is None or request.user.is_authenticated:
+        return None
+    return news.modified
+
+
+class NewsConditionMixin:
+    """
+    ETag и Last-Modified новости и ответ 304 без рендеринга.
+
+    Стоит после кэша страниц: закэшированную страницу аноним получает
+    без запросов к БД, условный запрос к ней проверяет сам кэш.
+    Без кэша на 304 уходит один запрос к БД.
+    """
+
+    @method_decorator(condition(
+        etag_func=news_etag, last_modified_func=news_last_modified
+    ))
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+
+class NewsDetail(
+        AnonymousPageCacheMixin,
+        NewsConditionMixin,
+        CommentsPageMixin,
+        generic.DetailView
+):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
+        obj = get_news(self.request, self.kwargs['pk'])
+        if obj is None:
+            raise Http404('Новость не найдена.')
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(self.get_comments_page(self.object.pk))
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
 
 
+class NewsCommentList(CommentsPageMixin, generic.TemplateView):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    template_name = 'news/comments.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_comments_page(
+            self.kwargs['pk'], self.request.GET.get('cursor')
+        ))
+        return context
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CommentsPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -55,6 +170,11 @@ class NewsComment(
         self.object = self.get_object()
         return super().post(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_comments_page(self.object.pk))
+        return context
+
     def form_valid(self, form):
         comment = form.save(commit=False)
         comment.news = self.object
@@ -63,8 +183,9 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -83,9 +204,9 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Комментарий уже загружен, новость для адреса не нужна."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
@@ -0,0 +1,124 @@
+"""
+Чтение новостей с реплик, запись и чтение после записи - с основной базы.
+
+Реплики перечислены в настройке DATABASE_REPLICAS. Пока список пуст,
+все запросы идут в основную базу. Реплики используются только внутри
+запроса, который обрабатывает PrimaryPinMiddleware: команды, тесты
+и консоль читают основную базу и видят свои же записи.
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_APPS = {'news'}
+PIN_COOKIE = 'use_primary'
+
+# Почему запрос читает только основную базу: недавняя запись
+# по куке или запись в этом же запросе.
+PINNED_BY_COOKIE = 'cookie'
+PINNED_BY_WRITE = 'write'
+
+
+class RequestRouting:
+    """
+    Маршрутизация одного запроса.
+
+    Реплика выбирается один раз, чтобы все чтения запроса видели
+    данные с одинаковым отставанием.
+    """
+
+    def __init__(self, pinned=None):
+        replicas = settings.DATABASE_REPLICAS
+        self.replica = random.choice(replicas) if replicas else None
+        self.pinned = pinned
+
+
+# Изменяется на месте, поэтому запись в потоке пула асинхронных
+# представлений видна и в самом запросе.
+request_routing = ContextVar('request_routing', default=None)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        routing = request_routing.get()
+        if (
+            routing is None
+            or routing.replica is None
+            or routing.pinned
+            or model._meta.app_label not in REPLICA_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = request_routing.get()
+        if routing is not None:
+            routing.pinned = PINNED_BY_WRITE
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с данными при синхронизации.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PrimaryPinMiddleware:
+    """
+    Ограничивает закрепление за основной базой одним запросом.
+
+    После записи ставит куку на REPLICA_LAG_SECONDS: следующий запрос,
+    например страница после редиректа, тоже читает основную базу
+    и видит только что сохранённые данные.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Как в MiddlewareMixin: под ASGI с асинхронными представлениями
+        # промежуточный слой не должен занимать поток.
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        routing = self.start_routing(request)
+        token = request_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_routing.reset(token)
+        return self.process_response(response, routing)
+
+    async def __acall__(self, request):
+        routing = self.start_routing(request)
+        token = request_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_routing.reset(token)
+        return self.process_response(response, routing)
+
+    def start_routing(self, request):
+        return RequestRouting(
+            PINNED_BY_COOKIE if PIN_COOKIE in request.COOKIES else None
+        )
+
+    def process_response(self, response, routing):
+        if routing.pinned == PINNED_BY_WRITE and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_LAG_SECONDS, samesite='Lax',
+            )
+        return response
@@ -1,9 +1,14 @@
+import os
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для проектов пакет shared лежит в корне репозитория.
+sys.path.append(str(BASE_DIR.parent))
+
 SECRET_KEY = 'django-insecure-7)dgs++2!#==aye4rd=5)c)bw0eokiyqx0hts6#t80!$c&$s+('
 
 DEBUG = True
@@ -21,6 +26,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shared.metrics.MetricsMiddleware',
+    'yanews.routers.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,9 +62,50 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Файл тестовой базы, чтобы не создавать схему заново
+        # при каждом запуске (pytest --reuse-db). По умолчанию
+        # тестовая база создаётся в памяти.
+        'TEST': {'NAME': os.environ.get('YANEWS_TEST_DB')},
     }
 }
 
+DATABASE_ROUTERS = ['yanews.routers.ReplicaRouter']
+
+# Псевдонимы реплик из DATABASES, см. settings_replicas.
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи читать основную базу.
+REPLICA_LAG_SECONDS = 10
+
+# Оба варианта работают без внешних сервисов. Файловый кэш общий
+# для всех процессов, кэш в памяти у каждого процесса свой.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+    },
+    # Без кэша: для замеров работы представлений.
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YANEWS_CACHE', 'locmem')],
+    # Метки версий контента и списка запрещённых слов. Хранилище должно
+    # быть общим для всех процессов: иначе изменение, сделанное в одном
+    # воркере, не увидят остальные. Подойдёт и общий кэш вроде Redis.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'versions',
+    },
+}
+
+PAGE_CACHE_TIMEOUT = 60 * 5
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +128,29 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 20
+
+NEWS_SEARCH_RESULTS = 20
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Потоки для работы с базой в асинхронных представлениях.
+ASYNC_DB_WORKERS = 8
+
+# Сколько одинаковых SQL-запросов за запрос считать признаком N+1.
+METRICS_N_PLUS_ONE_QUERIES = 5
+
+# Откуда, кроме персонала, можно читать /metrics/. Адрес берётся
+# из REMOTE_ADDR: за обратным прокси на той же машине это адрес прокси,
+# и метрики увидит любой клиент. В таком случае список нужно очистить
+# и передавать токен в заголовке «Authorization: Bearer <токен>».
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Каталог, через который процессы складывают метрики. Без него каждый
+# воркер отдаёт только свои суммы, и при нескольких воркерах Prometheus
+# видит то одни, то другие. Файлы остановленных воркеров остаются,
+# чтобы суммы не убывали; каталог можно очистить при перезапуске сервиса.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_DUMP_INTERVAL = 1
@@ -0,0 +1,29 @@
+"""
+Профиль для нагруженного запуска на SQLite.
+
+Включается через DJANGO_SETTINGS_MODULE=yanews.settings_production.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DEBUG = False
+
+DATABASES['default'].update({
+    # Держим соединение между запросами вместо подключения на каждый.
+    'CONN_MAX_AGE': 600,
+    # Ждать освобождения блокировки записи до 20 секунд
+    # вместо немедленной ошибки "database is locked".
+    'OPTIONS': {'timeout': 20},
+})
+
+# Выполняются для каждого нового соединения, см. shared.db.
+SQLITE_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот.
+    'journal_mode': 'WAL',
+    # В режиме WAL безопасно: fsync только при контрольных точках.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Отрицательное значение - размер кэша страниц в КиБ.
+    'cache_size': -64 * 1024,
+}
@@ -0,0 +1,18 @@
+"""
+Профиль с репликами для чтения на локальных файлах SQLite.
+
+Включается через DJANGO_SETTINGS_MODULE=yanews.settings_replicas.
+Реплики заполняются копией основной базы командой sync_replicas.
+"""
+from .settings_production import *  # noqa: F401,F403
+from .settings_production import BASE_DIR, DATABASES
+
+DATABASE_REPLICAS = ['replica1', 'replica2']
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db_{alias}.sqlite3',
+        # В тестах реплики смотрят в тестовую основную базу.
+        'TEST': {'MIRROR': 'default'},
+    }
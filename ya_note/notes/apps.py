@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+from shared.db import apply_sqlite_pragmas
 
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from . import search  # noqa: F401
+
+        connection_created.connect(apply_sqlite_pragmas)
+        post_migrate.connect(search.clear_flushed_index, sender=self)
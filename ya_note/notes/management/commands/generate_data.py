@@ -0,0 +1,88 @@
+from django.core.management.base import CommandError
+from django.db.models import Max
+from pytils.translit import slugify
+
+from notes.models import Note
+from notes.search import index_notes_after
+from shared.datagen import GenerateDataCommand, zipf_counts
+
+COMMON_WORDS = (
+    'и', 'в', 'не', 'на', 'что', 'с', 'по', 'это', 'как', 'а', 'для', 'из',
+    'заметка', 'купить', 'сделать', 'позвонить', 'список', 'идея', 'план',
+)
+# Сколько символов заголовка попадает в slug перед суффиксом «-pk».
+SLUG_TITLE_LENGTH = 80
+
+
+class Command(GenerateDataCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями и заметками '
+        'для замеров производительности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--notes', type=int, default=1000000)
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения заметок по авторам.',
+        )
+        parser.add_argument(
+            '--median-words',
+            type=int,
+            default=40,
+            help='Медианная длина заметки в словах.',
+        )
+        parser.add_argument(
+            '--sigma',
+            type=float,
+            default=1.2,
+            help='Разброс длины заметок: чем больше, тем длиннее хвост.',
+        )
+        super().add_arguments(parser)
+
+    def handle(self, *args, users, notes, zipf, median_words, sigma,
+               **options):
+        self.prepare((users, notes), COMMON_WORDS, **options)
+        if notes and not users:
+            raise CommandError('Для заметок нужен хотя бы один пользователь.')
+        user_ids = self.create_users(users)
+        last_pk = Note.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        counts = zipf_counts(
+            self.rng, len(user_ids), notes, zipf, self.chunk_size
+        )
+        self.create_notes(last_pk + 1, user_ids, counts, median_words, sigma)
+        index_notes_after(last_pk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, заметок: {notes}'
+        ))
+
+    def create_notes(self, first_pk, user_ids, counts, median_words, sigma):
+        """
+        Заметки с заранее известными ключами.
+
+        bulk_create обходит Note.save, поэтому slug строится здесь:
+        суффикс с первичным ключом делает его уникальным без проверок.
+        """
+        text_limit = median_words * 100
+
+        def notes():
+            pk = first_pk
+            for author_id, count in zip(user_ids, counts):
+                for _ in range(count):
+                    title = self.text.sentence(self.rng.randint(2, 8))[:100]
+                    slug = slugify(title)[:SLUG_TITLE_LENGTH].strip('-')
+                    yield Note(
+                        pk=pk,
+                        title=title,
+                        text=self.text.text(self.text.lognormal_length(
+                            median_words, sigma, text_limit
+                        )),
+                        slug=f'{slug}-{pk}',
+                        author_id=author_id,
+                    )
+                    pk += 1
+
+        self.save_in_chunks('Заметки', Note.objects, notes())
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_fts_table(apps, schema_editor):
+    """
+    Создаёт и заполняет индекс FTS5.
+
+    Если SQLite собран без FTS5 или база другая, поиск
+    будет использовать индекс в памяти процесса.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE notes_note_fts USING fts5('
+            'title, text, owner, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        return
+    schema_editor.execute(
+        'INSERT INTO notes_note_fts (rowid, title, text, owner) '
+        "SELECT id, title, text, 'u' || author_id FROM notes_note"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS notes_note_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
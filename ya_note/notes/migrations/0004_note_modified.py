@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+    ]
@@ -1,8 +1,16 @@
+import re
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Cast, Substr
 
 from pytils.translit import slugify
 
+# Место под суффикс «-N» в конце slug.
+SLUG_SUFFIX_LENGTH = 8
+SLUG_ALLOCATION_ATTEMPTS = 3
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -26,13 +34,66 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    modified = models.DateTimeField('Изменена', auto_now=True)
+
+    class Meta:
+        # Покрывает и выборку по author, поэтому отдельный индекс FK не нужен.
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    def allocate_slug(self):
+        """
+        Подбирает свободный slug по заголовку одним запросом.
+
+        Занятый slug получает числовой суффикс: note, note-2, note-3.
+        Из базы читаются только признак занятости slug и наибольший
+        суффикс: кандидаты «stem-N» выбираются по индексу диапазоном
+        и не загружаются в память.
+        """
+        max_length = self._meta.get_field('slug').max_length
+        slug = slugify(self.title)[:max_length] or 'note'
+        stem = slug[:max_length - SLUG_SUFFIX_LENGTH]
+        numbered = Q(
+            # Дефис и точка соседние в ASCII: диапазон - ровно «stem-…».
+            slug__gte=f'{stem}-',
+            slug__lt=f'{stem}.',
+            slug__regex=rf'^{re.escape(stem)}-[0-9]+$',
+        )
+        notes = type(self).objects.filter(Q(slug=slug) | numbered)
+        if self.pk is not None:
+            notes = notes.exclude(pk=self.pk)
+        found = notes.aggregate(
+            taken=Count('pk', filter=Q(slug=slug)),
+            last=Max(
+                Cast(Substr('slug', len(stem) + 2), models.IntegerField()),
+                filter=numbered,
+            ),
+        )
+        if not found['taken']:
+            return slug
+        return f'{stem}-{(found["last"] or 1) + 1}'
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Пустой slug подбирается автоматически.
+
+        Если тот же slug успел занять параллельный запрос,
+        уникальный индекс не даст сохранить дубль и подбор повторится.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            self.slug = self.allocate_slug()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                    self.slug = ''
+                    raise
@@ -0,0 +1,280 @@
+"""
+Полнотекстовый поиск по заметкам пользователя.
+
+Основной индекс - виртуальная таблица SQLite FTS5, её создаёт миграция.
+Если FTS5 недоступен, используется инвертированный индекс в памяти
+процесса. Оба индекса обновляются при сохранении и удалении заметок.
+"""
+import bisect
+import math
+import re
+import uuid
+from collections import Counter, OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+# Псевдоним кэша, общего для всех процессов, см. CACHES в настройках.
+VERSIONS_CACHE = 'versions'
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_WORDS = 12
+TITLE_WEIGHT = 10.0
+TOKEN = re.compile(r'\w+')
+
+SearchResult = namedtuple('SearchResult', ('note', 'snippet'))
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower().replace('ё', 'е'))
+
+
+def owner_token(author_id):
+    """Слово столбца owner в FTS5, см. миграцию 0003_note_fts."""
+    return f'u{author_id}'
+
+
+def highlight(text):
+    """Экранирует текст и превращает маркеры совпадений в <mark>."""
+    return mark_safe(
+        escape(text).replace(
+            MARK_START, '<mark>'
+        ).replace(MARK_END, '</mark>')
+    )
+
+
+class FTS5Index:
+    """Индекс в виртуальной таблице FTS5 той же базы данных."""
+
+    def update(self, note):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [note.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, text, owner) '
+                'VALUES (%s, %s, %s, %s)',
+                [note.pk, note.title, note.text, owner_token(note.author_id)],
+            )
+
+    def remove(self, note):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [note.pk]
+            )
+
+    def index_after(self, last_pk):
+        """Индексирует заметки с pk больше last_pk одним запросом."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, text, owner) '
+                "SELECT id, title, text, 'u' || author_id "
+                'FROM notes_note WHERE id > %s',
+                [last_pk],
+            )
+
+    def search(self, author_id, query, limit):
+        """Возвращает [(id заметки, фрагмент с маркерами)] по убыванию веса."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # FTS5 пересекает списки строк владельца и слов запроса,
+        # поэтому чужие заметки не перебираются. Слова ищутся только
+        # в заголовке и тексте, иначе «u<id>» находил бы все заметки.
+        match = 'owner : {} AND {{title text}} : ({})'.format(
+            owner_token(author_id),
+            ' '.join(f'"{token}"*' for token in tokens),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 1, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, 1.0, 0.0) LIMIT %s',
+                [MARK_START, MARK_END, '…', SNIPPET_WORDS,
+                 match, TITLE_WEIGHT, limit],
+            )
+            return cursor.fetchall()
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс в памяти процесса.
+
+    Строится для каждого автора при первом поиске одним запросом
+    и перестраивается, когда меняется версия его заметок. Версии
+    хранятся в кэше, общем для процессов, а в памяти держатся индексы
+    только max_authors последних авторов.
+    """
+
+    def __init__(self, max_authors=None):
+        self.max_authors = (
+            max_authors or settings.NOTES_SEARCH_CACHED_AUTHORS
+        )
+        self._authors = OrderedDict()
+
+    @staticmethod
+    def _version_key(author_id):
+        return f'notes:search-version:{author_id}'
+
+    def update(self, note):
+        caches[VERSIONS_CACHE].set(
+            self._version_key(note.author_id), uuid.uuid4().hex, None
+        )
+
+    remove = update
+
+    def index_after(self, last_pk):
+        """Сбрасывает индексы авторов заметок с pk больше last_pk."""
+        author_ids = Note.objects.filter(pk__gt=last_pk).values_list(
+            'author_id', flat=True
+        ).distinct()
+        caches[VERSIONS_CACHE].set_many(
+            {self._version_key(author_id): uuid.uuid4().hex
+             for author_id in author_ids},
+            None,
+        )
+
+    def _get(self, author_id):
+        versions = caches[VERSIONS_CACHE]
+        key = self._version_key(author_id)
+        version = versions.get(key)
+        if version is None:
+            versions.add(key, uuid.uuid4().hex, None)
+            version = versions.get(key)
+        cached = self._authors.get(author_id)
+        if cached is not None and cached[0] == version:
+            self._authors.move_to_end(author_id)
+            return cached
+        postings = {}
+        texts = {}
+        for note_id, title, text in Note.objects.filter(
+                author_id=author_id
+        ).values_list('id', 'title', 'text').iterator():
+            texts[note_id] = text
+            weights = Counter(tokenize(text))
+            for token in tokenize(title):
+                weights[token] += TITLE_WEIGHT
+            for token, weight in weights.items():
+                postings.setdefault(token, {})[note_id] = weight
+        cached = (version, postings, sorted(postings), texts)
+        self._authors[author_id] = cached
+        self._authors.move_to_end(author_id)
+        while len(self._authors) > self.max_authors:
+            self._authors.popitem(last=False)
+        return cached
+
+    def search(self, author_id, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        _, postings, terms, texts = self._get(author_id)
+        scores = None
+        for token in tokens:
+            # Как и в FTS5, каждое слово запроса ищется по префиксу.
+            token_scores = Counter()
+            start = bisect.bisect_left(terms, token)
+            for term in terms[start:]:
+                if not term.startswith(token):
+                    break
+                idf = math.log(1 + len(texts) / len(postings[term]))
+                for note_id, weight in postings[term].items():
+                    token_scores[note_id] += weight * idf
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = Counter({
+                    note_id: score + token_scores[note_id]
+                    for note_id, score in scores.items()
+                    if note_id in token_scores
+                })
+        return [
+            (note_id, self._snippet(texts[note_id], tokens))
+            for note_id, _ in scores.most_common(limit)
+        ]
+
+    @staticmethod
+    def _snippet(text, tokens):
+        words = text.split()
+        matched = [
+            any(tokenize(word) and tokenize(word)[0].startswith(token)
+                for token in tokens)
+            for word in words
+        ]
+        start = max(matched.index(True) - 2, 0) if any(matched) else 0
+        fragment = [
+            f'{MARK_START}{word}{MARK_END}' if is_match else word
+            for word, is_match in zip(
+                words[start:start + SNIPPET_WORDS],
+                matched[start:start + SNIPPET_WORDS],
+            )
+        ]
+        prefix = '…' if start else ''
+        suffix = '…' if start + SNIPPET_WORDS < len(words) else ''
+        return prefix + ' '.join(fragment) + suffix
+
+
+_fts5_index = FTS5Index()
+_inverted_index = InvertedIndex()
+_fts5_available = None
+
+
+def get_index():
+    """FTS5, если миграция смогла создать таблицу, иначе индекс в памяти."""
+    global _fts5_available
+    if _fts5_available is None:
+        _fts5_available = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts5_index if _fts5_available else _inverted_index
+
+
+def index_notes_after(last_pk):
+    """Индексирует заметки, добавленные в обход сигналов bulk_create."""
+    get_index().index_after(last_pk)
+
+
+def search_notes(user, query, limit=50):
+    """Заметки пользователя по запросу, самые подходящие первыми."""
+    found = get_index().search(user.pk, query, limit)
+    notes = Note.objects.filter(
+        author=user, pk__in=[note_id for note_id, _ in found]
+    ).only('id', 'slug', 'title').in_bulk()
+    return [
+        SearchResult(notes[note_id], highlight(snippet))
+        for note_id, snippet in found if note_id in notes
+    ]
+
+
+def clear_flushed_index(using, **kwargs):
+    """
+    Очищает таблицу FTS5, если заметок в базе нет.
+
+    flush после транзакционных тестов не трогает виртуальную таблицу,
+    и строки удалённых заметок переживали бы его, в том числе
+    в тестовой базе, сохранённой между запусками (--reuse-db).
+    """
+    db = connections[using]
+    if (
+        FTS_TABLE in db.introspection.table_names()
+        and not Note.objects.using(using).exists()
+    ):
+        with db.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, **kwargs):
+    get_index().update(instance)
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender, instance, **kwargs):
+    get_index().remove(instance)
@@ -0,0 +1,29 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class BudgetMixin:
+    """
+    Проверка бюджета SQL-запросов и размера страницы для TestCase.
+
+    Помогает заметить N+1 и списки без ограничения длины.
+    """
+
+    def get_within_budget(self, url, max_queries, max_size, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+            # Потоковый ответ читает базу, пока отдаётся.
+            content = b''.join(response) if response.streaming else (
+                response.content
+            )
+        self.assertLessEqual(
+            len(context), max_queries,
+            f'{url}: запросов {len(context)}, бюджет {max_queries}\n'
+            + '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+        self.assertLessEqual(
+            len(content), max_size,
+            f'{url}: страница {len(content)} байт, '
+            f'бюджет {max_size}'
+        )
+        return response
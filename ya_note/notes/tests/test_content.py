@@ -1,8 +1,15 @@
+import json
+from http import HTTPStatus
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from notes.models import Note
+from notes.search import FTS_TABLE, InvertedIndex
 
 User = get_user_model()
 
@@ -49,3 +56,222 @@ class TestContent(TestCase):
                 self.client.force_login(self.author)
                 response = self.client.get(url)
                 self.assertIn('form', response.context)
+
+    def test_detail_page_supports_conditional_get(self):
+        """
+        Повторный запрос неизменённой заметки получает 304 без тела,
+        после изменения заметки - страницу целиком.
+        """
+        url = reverse('notes:detail', args=(self.note.slug,))
+        self.client.force_login(self.author)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.note.text = 'Новый текст'
+        self.note.save()
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_notes_list_is_paginated_without_text(self):
+        """
+        Список заметок выводится страницами и по курсору,
+        текст заметок не загружается.
+        """
+        Note.objects.bulk_create(
+            Note(title=f'Запись {index}', text='Текст',
+                 slug=f'note-{index}', author=self.author)
+            for index in range(4)
+        )
+        all_notes = list(
+            Note.objects.filter(author=self.author).order_by('id')
+        )
+        url = reverse('notes:list')
+        self.client.force_login(self.author)
+        with self.settings(NOTES_COUNT_ON_LIST_PAGE=2):
+            response = self.client.get(url, {'page': 2})
+            self.assertEqual(
+                list(response.context['object_list']), all_notes[2:4]
+            )
+            shown = []
+            params = {'after': 0}
+            while params['after'] is not None:
+                response = self.client.get(url, params)
+                shown += response.context['object_list']
+                params['after'] = response.context['next_cursor']
+        self.assertEqual(shown, all_notes)
+        self.assertIn('text', shown[0].get_deferred_fields())
+
+    def test_invalid_notes_list_cursor_returns_404(self):
+        """
+        Отрицательный, нечисловой или слишком большой курсор даёт 404.
+        """
+        self.client.force_login(self.author)
+        url = reverse('notes:list')
+        for after in ('-1', 'abc', '9' * 25, str(2 ** 63)):
+            with self.subTest(after=after):
+                response = self.client.get(url, {'after': after})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_export_streams_only_own_notes(self):
+        """
+        Выгрузка отдаётся потоком и содержит только заметки пользователя.
+        """
+        Note.objects.create(
+            title='Чужая', text='Текст', slug='other', author=self.reader
+        )
+        self.client.force_login(self.author)
+        url = reverse('notes:export')
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['slug'] for line in lines], [self.note.slug]
+        )
+        response = self.client.get(url, {'format': 'csv'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'id,title,text,slug')
+        self.assertEqual(len(rows), 2)
+
+    def test_notes_list_uses_index(self):
+        """
+        Список заметок выбирается по индексу (author, id).
+        """
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('notes:list'))
+        note_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "notes_note"' in query['sql']
+        ]
+        self.assertTrue(note_queries)
+        with connection.cursor() as cursor:
+            for sql in note_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn('INDEX note_author_id_idx', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TestMetrics(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+
+    def test_request_cost_is_exposed(self):
+        """
+        Стоимость запроса видна в Server-Timing и в метриках по маршруту.
+        """
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('django_requests_total{view="notes:list"}', metrics)
+
+
+class TestSearch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Pushkin')
+        cls.reader = User.objects.create(username='Lermontov')
+        cls.note = Note.objects.create(
+            title='Список покупок',
+            text='Купить хлеб, молоко и <яблоки>',
+            author=cls.author,
+        )
+        cls.other_note = Note.objects.create(
+            title='Стихи',
+            text='Мороз и солнце, день чудесный',
+            author=cls.author,
+        )
+        cls.reader_note = Note.objects.create(
+            title='Покупки',
+            text='Купить молоко',
+            author=cls.reader,
+        )
+        cls.url = reverse('notes:search')
+
+    def search(self, user, query):
+        self.client.force_login(user)
+        return self.client.get(self.url, {'q': query}).context['results']
+
+    def test_search_finds_only_own_notes(self):
+        """
+        Поиск находит заметки по словам и их началу
+        только среди заметок пользователя.
+        """
+        results = self.search(self.author, 'молок')
+        self.assertEqual([result.note for result in results], [self.note])
+        self.assertIn('<mark>молоко</mark>', results[0].snippet)
+        self.assertIn('&lt;яблоки&gt;', results[0].snippet)
+        self.assertEqual(self.search(self.reader, 'мороз'), [])
+
+    def test_search_does_not_match_owner(self):
+        """
+        Слова запроса не сравниваются с владельцем заметки.
+        """
+        for query in ('u', f'u{self.author.pk}', str(self.author.pk)):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(self.author, query), [])
+
+    def test_search_index_follows_changes(self):
+        """
+        Изменённые и удалённые заметки сразу учитываются в поиске.
+        """
+        self.other_note.text = 'Буря мглою небо кроет'
+        self.other_note.save()
+        self.assertEqual(self.search(self.author, 'мороз'), [])
+        self.assertEqual(len(self.search(self.author, 'буря')), 1)
+        self.other_note.delete()
+        self.assertEqual(self.search(self.author, 'буря'), [])
+
+    def test_inverted_index_fallback(self):
+        """
+        Индекс в памяти находит те же заметки, что и FTS5.
+        """
+        index = InvertedIndex()
+        found = index.search(self.author.pk, 'купить молок', 10)
+        self.assertEqual([note_id for note_id, _ in found], [self.note.pk])
+        self.assertIn('\x02молоко\x03', found[0][1])
+        self.other_note.delete()
+        index.remove(self.other_note)
+        self.assertEqual(index.search(self.author.pk, 'мороз', 10), [])
+
+    def test_inverted_index_keeps_recent_authors(self):
+        """
+        Индекс в памяти держит только последних авторов и видит
+        изменения, сделанные другим процессом через общий кэш версий.
+        """
+        index = InvertedIndex(max_authors=1)
+        index.search(self.author.pk, 'мороз', 10)
+        index.search(self.reader.pk, 'молоко', 10)
+        self.assertEqual(list(index._authors), [self.reader.pk])
+        other_process = InvertedIndex()
+        Note.objects.filter(pk=self.reader_note.pk).update(text='Кефир')
+        other_process.update(self.reader_note)
+        self.assertEqual(index.search(self.reader.pk, 'молоко', 10), [])
+
+
+class TestSearchIndexFlush(TransactionTestCase):
+
+    def test_flush_clears_search_index(self):
+        """
+        flush после транзакционных тестов очищает и таблицу FTS5,
+        иначе в сохранённой тестовой базе оставались бы чужие строки.
+        """
+        Note.objects.create(
+            title='Заметка',
+            text='Текст',
+            author=User.objects.create(username='Pushkin'),
+        )
+        call_command('flush', interactive=False, verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+            self.assertEqual(cursor.fetchone(), (0,))
@@ -1,13 +1,18 @@
 # news/tests/test_logic.py
 from http import HTTPStatus
+from io import StringIO
 from pytils.translit import slugify
 
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from notes.forms import WARNING
 from notes.models import Note
+from notes.search import search_notes
 
 User = get_user_model()
 
@@ -94,6 +99,72 @@ class TestNoteCreationIfSlugIsAlreadyExists(TestCase):
         self.assertEqual(Note.objects.count(), 1)
 
 
+class TestSlugAllocation(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.url = reverse('notes:add')
+        cls.user = User.objects.create(username='Pushkin')
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.user)
+        cls.form_data = {
+            'title': 'Random title',
+            'text': 'Note text',
+        }
+
+    def test_same_titles_get_numbered_slugs(self):
+        """
+        Записи с одинаковым заголовком без slug получают
+        slug с числовым суффиксом.
+        """
+        for _ in range(3):
+            response = self.auth_client.post(self.url, data=self.form_data)
+            self.assertRedirects(response, reverse('notes:success'))
+        base = slugify(self.form_data['title'])
+        self.assertEqual(
+            list(Note.objects.order_by('id').values_list('slug', flat=True)),
+            [base, f'{base}-2', f'{base}-3'],
+        )
+
+    def test_slug_is_allocated_with_single_query(self):
+        """
+        Подбор slug при коллизиях делает один запрос на чтение.
+        """
+        for index in range(1, 4):
+            Note.objects.create(
+                title='Заголовок', text='Текст', author=self.user,
+                slug=f'{slugify("Заголовок")}-{index}',
+            )
+        note = Note(title='Заголовок', text='Текст', author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            note.save()
+        selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(note.slug, slugify('Заголовок'))
+        note = Note(title='Заголовок', text='Текст', author=self.user)
+        note.save()
+        self.assertEqual(note.slug, f'{slugify("Заголовок")}-4')
+
+    def test_slug_suffix_ignores_other_slugs_with_same_start(self):
+        """
+        Slug, который лишь начинается так же, не влияет на суффикс.
+        Наибольший суффикс считается в базе, slug не загружаются.
+        """
+        base = slugify('Заголовок')
+        for slug in (base, f'{base}-2', f'{base}-x-99', f'{base}s-50'):
+            Note.objects.create(
+                title='Заголовок', text='Текст', author=self.user, slug=slug,
+            )
+        note = Note(title='Заголовок', text='Текст', author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            note.save()
+        self.assertEqual(note.slug, f'{base}-3')
+        self.assertIn('MAX(', context.captured_queries[0]['sql'])
+
+
 class TestCommentEditDelete(TestCase):
     NOTE_TEXT = 'Текст'
     NOTE_UPDATED_TEXT = 'Updated note.text'
@@ -152,3 +223,37 @@ class TestCommentEditDelete(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.note.refresh_from_db()
         self.assertEqual(self.note.text, self.NOTE_TEXT)
+
+
+class TestGenerateData(TestCase):
+
+    def test_generate_data(self):
+        """
+        Команда generate_data создаёт пользователей и заметки
+        с уникальными slug, заметки сразу находятся поиском.
+        """
+        call_command(
+            'generate_data', users=3, notes=50, chunk_size=20,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Note.objects.count(), 50)
+        note = Note.objects.last()
+        self.assertTrue(note.slug.endswith(f'-{note.pk}'))
+        found = search_notes(note.author, note.title.split()[0])
+        self.assertIn(note, [result.note for result in found])
+
+    def test_generate_data_rejects_impossible_options(self):
+        """
+        Заметки без пользователей и отрицательные количества
+        дают понятную ошибку команды.
+        """
+        for options in (
+                {'users': 0, 'notes': 10},
+                {'users': -1, 'notes': 0},
+                {'users': 3, 'notes': 10, 'chunk_size': 0},
+        ):
+            with self.subTest(**options):
+                with self.assertRaises(CommandError):
+                    call_command('generate_data', stdout=StringIO(), **options)
+        self.assertFalse(Note.objects.exists())
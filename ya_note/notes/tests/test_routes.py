@@ -5,11 +5,28 @@ from django.test import TestCase
 from django.urls import reverse
 
 from notes.models import Note
+from notes.tests.budget import BudgetMixin
 
 User = get_user_model()
 
+# Бюджеты страниц: не больше стольких SQL-запросов и байт в ответе.
+BUDGETS = {
+    'notes:home': (0, 2000),
+    'notes:list': (4, 3000),
+    'notes:add': (2, 4500),
+    'notes:success': (2, 2500),
+    'notes:edit': (3, 4500),
+    'notes:delete': (3, 2500),
+    'notes:detail': (3, 2500),
+    'notes:search': (4, 2500),
+    'notes:export': (3, 500),
+    'users:login': (0, 4000),
+    'users:logout': (0, 2000),
+    'users:signup': (0, 5500),
+}
 
-class Tests(TestCase):
+
+class Tests(BudgetMixin, TestCase):
 
     @classmethod
     def setUpTestData(cls):
@@ -35,7 +52,7 @@ class Tests(TestCase):
         for name in urls:
             with self.subTest(name=name):
                 url = reverse(name)
-                response = self.client.get(url)
+                response = self.get_within_budget(url, *BUDGETS[name])
                 self.assertEqual(response.status_code, HTTPStatus.OK)
 
     def test_availability_for_pages_list_add_done(self):
@@ -54,9 +71,32 @@ class Tests(TestCase):
         for name in urls:
             with self.subTest(name=name):
                 url = reverse(name)
-                response = self.client.get(url)
+                response = self.get_within_budget(url, *BUDGETS[name])
                 self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_search_and_export_within_budget(self):
+        """
+        Поиск с найденной заметкой и выгрузка укладываются в бюджет
+        вместе с чтением заметок из базы.
+        """
+        self.client.force_login(self.author)
+        for name, data in (
+                ('notes:search', {'q': 'запись'}),
+                ('notes:export', {'format': 'jsonl'}),
+                ('notes:export', {'format': 'csv'}),
+        ):
+            with self.subTest(name=name, data=data):
+                response = self.get_within_budget(
+                    reverse(name), *BUDGETS[name], data=data
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            len(self.client.get(
+                reverse('notes:search'), {'q': 'запись'}
+            ).context['results']),
+            1,
+        )
+
     def test_availability_for_note_edit_delete_detail(self):
         """
         Пользователь может редактировать и удалять свои записи
@@ -71,7 +111,7 @@ class Tests(TestCase):
             for name in ('notes:edit', 'notes:delete', 'notes:detail'):
                 with self.subTest(name=name):
                     url = reverse(name, args=(self.note.slug,))
-                    response = self.client.get(url)
+                    response = self.get_within_budget(url, *BUDGETS[name])
                     self.assertEqual(response.status_code, status)
 
     def test_redirect_for_anonymous_client(self):
@@ -90,9 +130,11 @@ class Tests(TestCase):
                 ('notes:add', None),
                 ('notes:list', None),
                 ('notes:success', None),
+                ('notes:search', None),
+                ('notes:export', None),
         ):
             with self.subTest(name=name):
                 url = reverse(name, args=args)
                 redirect_url = f'{login_url}?next={url}'
-                response = self.client.get(url)
+                response = self.get_within_budget(url, *BUDGETS[name])
                 self.assertRedirects(response, redirect_url)
@@ -1,9 +1,20 @@
+import csv
+import json
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
 from .forms import NoteForm
 from .models import Note
+from .search import search_notes
+
+# Наибольший первичный ключ, который SQLite примет как параметр запроса.
+MAX_PK = 2 ** 63 - 1
 
 
 class Home(generic.TemplateView):
@@ -50,10 +61,149 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список всех заметок пользователя.
+
+    Постранично (?page=N) или по курсору (?after=<id последней заметки>).
+    Курсор не считает общее количество и не пропускает строки через OFFSET.
+    """
     template_name = 'notes/list.html'
+    next_cursor = None
 
+    def get_paginate_by(self, queryset):
+        return settings.NOTES_COUNT_ON_LIST_PAGE
 
+    def get_queryset(self):
+        """Загружаем только поля, которые выводятся в списке."""
+        return super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+
+    def paginate_queryset(self, queryset, page_size):
+        after = self.request.GET.get('after')
+        if after is None:
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            after = int(after)
+        except ValueError:
+            raise Http404('Некорректный курсор.')
+        if not 0 <= after <= MAX_PK:
+            raise Http404('Некорректный курсор.')
+        notes = list(queryset.filter(id__gt=after)[:page_size + 1])
+        has_next = len(notes) > page_size
+        notes = notes[:page_size]
+        if has_next:
+            self.next_cursor = notes[-1].id
+        return None, None, notes, has_next
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class NotesExport(NoteBase, generic.View):
+    """
+    Выгрузка всех заметок пользователя в JSONL или CSV.
+
+    Строки читаются из БД порциями и сразу отправляются клиенту.
+    """
+    fields = ('id', 'title', 'text', 'slug')
+    content_types = {
+        'jsonl': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'jsonl')
+        if export_format not in self.content_types:
+            raise Http404('Неизвестный формат.')
+        rows = self.get_queryset().order_by('id').values_list(
+            *self.fields
+        ).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        lines = getattr(self, f'{export_format}_lines')(rows)
+        response = StreamingHttpResponse(
+            lines, content_type=self.content_types[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{export_format}"'
+        )
+        return response
+
+    def jsonl_lines(self, rows):
+        for row in rows:
+            yield json.dumps(
+                dict(zip(self.fields, row)), ensure_ascii=False
+            ) + '\n'
+
+    def csv_lines(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class NoteSearch(LoginRequiredMixin, generic.TemplateView):
+    """Поиск по заголовкам и текстам заметок пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = search_notes(
+            self.request.user, query, settings.NOTES_SEARCH_RESULTS
+        ) if query else []
+        return context
+
+
+def get_note(request, slug):
+    """
+    Заметка текущего пользователя, загруженная один раз за запрос.
+
+    По ней строятся ETag и Last-Modified, и её же выводит страница,
+    поэтому условный запрос не добавляет обращений к БД.
+    """
+    if not request.user.is_authenticated:
+        return None
+    if not hasattr(request, 'note'):
+        request.note = Note.objects.filter(
+            author=request.user, slug=slug
+        ).first()
+    return request.note
+
+
+def note_etag(request, slug):
+    note = get_note(request, slug)
+    if note is None:
+        return None
+    return f'{note.pk}:{note.modified.isoformat()}'
+
+
+def note_last_modified(request, slug):
+    note = get_note(request, slug)
+    return note and note.modified
+
+
+# Заметку видит только автор, поэтому страница не зависит от того,
+# кто её запросил: чужому пользователю ETag не выдаётся.
+@method_decorator(
+    condition(etag_func=note_etag, last_modified_func=note_last_modified),
+    name='dispatch',
+)
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_object(self, queryset=None):
+        note = get_note(self.request, self.kwargs['slug'])
+        if note is None:
+            raise Http404('Заметка не найдена.')
+        return note
@@ -1,9 +1,14 @@
+import os
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для проектов пакет shared лежит в корне репозитория.
+sys.path.append(str(BASE_DIR.parent))
+
 SECRET_KEY = 'django-insecure-yipnj$#j!ajarq%k55z4kuf3x79)91h0h42o9!1ho(z=!%mt=#'
 
 DEBUG = False
@@ -22,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shared.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,9 +62,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Файл тестовой базы, чтобы не создавать схему заново
+        # при каждом запуске (pytest --reuse-db). По умолчанию
+        # тестовая база создаётся в памяти.
+        'TEST': {'NAME': os.environ.get('YANOTE_TEST_DB')},
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Версии индексов поиска в памяти (notes.search.InvertedIndex).
+    # Заметку, изменённую в одном воркере, остальные узнают по новой
+    # версии, поэтому кэш нужен общий: файловый или, например, Redis.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'versions',
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +110,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_LIST_PAGE = 50
+
+NOTES_SEARCH_RESULTS = 50
+
+# Для скольких авторов держать в памяти индекс поиска без FTS5.
+NOTES_SEARCH_CACHED_AUTHORS = 100
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Сколько одинаковых SQL-запросов за запрос считать признаком N+1.
+METRICS_N_PLUS_ONE_QUERIES = 5
+
+# Откуда, кроме персонала, можно читать /metrics/. Адрес берётся
+# из REMOTE_ADDR: за обратным прокси на той же машине это адрес прокси,
+# и метрики увидит любой клиент. В таком случае список нужно очистить
+# и передавать токен в заголовке «Authorization: Bearer <токен>».
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Каталог, через который процессы складывают метрики. Без него каждый
+# воркер отдаёт только свои суммы, и при нескольких воркерах Prometheus
+# видит то одни, то другие. Файлы остановленных воркеров остаются,
+# чтобы суммы не убывали; каталог можно очистить при перезапуске сервиса.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_DUMP_INTERVAL = 1